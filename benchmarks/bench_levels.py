@@ -0,0 +1,45 @@
+"""Compare the old loop-based xp_to_level with the closed form.
+
+Run from the repo root: python -m benchmarks.bench_levels
+"""
+import random
+import timeit
+from typing import Tuple
+
+from utils.gamify import xp_to_level
+
+
+def xp_to_level_loop(xp: int) -> Tuple[int, int, int]:
+    # Previous implementation, kept here as the reference
+    level = 0
+    required_next = 50
+    total_for_next = required_next
+    base = 0
+    while xp >= total_for_next:
+        level += 1
+        base = total_for_next
+        required_next += 50 * (level + 1)
+        total_for_next += 50 * (level + 1)
+    return level, base, total_for_next
+
+
+def main() -> None:
+    for xp in range(0, 2_000_000, 7):
+        assert xp_to_level(xp) == xp_to_level_loop(xp), xp
+    print("closed form matches the loop for xp in [0, 2e6)")
+
+    print(f"{'xp':>10} {'loop us':>9} {'closed us':>10}")
+    for xp in (10, 1_000, 10_000, 100_000, 1_000_000, 10_000_000):
+        n = 2_000
+        loop = timeit.timeit(lambda: xp_to_level_loop(xp), number=n) / n * 1e6
+        closed = timeit.timeit(lambda: xp_to_level(xp), number=n) / n * 1e6
+        print(f"{xp:>10} {loop:>9.2f} {closed:>10.2f}")
+
+    xps = [random.randint(0, 500_000) for _ in range(10_000)]
+    loop = timeit.timeit(lambda: [xp_to_level_loop(x)[0] for x in xps], number=3) / 3 * 1e3
+    scalar = timeit.timeit(lambda: [xp_to_level(x)[0] for x in xps], number=3) / 3 * 1e3
+    print(f"10k users: loop {loop:.1f} ms, closed form {scalar:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import io
+import logging
 import time
 import datetime as dt
 from typing import List
@@ -8,72 +9,96 @@ from discord import app_commands
 from discord.ext import commands
 
 from utils import database as db
+from utils import embeds
+from utils import focusstats
+from utils import tz
+from utils.charts import ChartBusy, ChartRenderer
+
+logger = logging.getLogger("aurorafocus")
 
 
 class Analytics(commands.Cog):
+    # Charts read the per-user focus aggregates (utils.focusstats), which
+    # gamify.apply_focus_completion updates in the same transaction as the
+    # rewards. So this cog does not subscribe to FocusCompleted itself.
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.renderer = ChartRenderer.from_config(getattr(bot, "config", {}))
 
-    def _render_bar(self, labels: List[str], values: List[int], title: str) -> bytes:
-        import matplotlib
-        matplotlib.use("Agg")
-        import matplotlib.pyplot as plt
+    def cog_unload(self):
+        self.renderer.shutdown()
 
-        fig, ax = plt.subplots(figsize=(7, 3))
-        ax.bar(labels, values, color="#7C3AED")
-        ax.set_title(title)
-        ax.set_ylabel("Count")
-        ax.set_xlabel("")
-        plt.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", dpi=160)
-        plt.close(fig)
-        buf.seek(0)
-        return buf.read()
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Load the chart engine in the workers now rather than during someone's first /weekly_report
+        if not getattr(self.bot, "config", {}).get("charts", {}).get("prewarm", True):
+            return
+        started = time.perf_counter()
+        try:
+            engine = await self.renderer.prewarm()
+            logger.info("Chart workers warmed (%s) in %.0f ms", engine, (time.perf_counter() - started) * 1000)
+        except Exception:
+            logger.exception("Chart pre-warm failed")
+
+    async def _send_chart(self, interaction: discord.Interaction, labels: List[str], values: List[int],
+                          title: str, filename: str, content: str, theme: str) -> None:
+        try:
+            img = await self.renderer.bar(interaction.user.id, labels, values, title, theme=theme)
+        except ChartBusy:
+            await interaction.edit_original_response(embed=embeds.warn("Charts are busy right now. Try again in a few seconds."))
+            return
+        except Exception:
+            # Broken pool, render error, ...: always answer the deferred interaction
+            logger.exception("Chart render failed")
+            await interaction.edit_original_response(embed=embeds.error("Couldn't draw that chart. Please try again later."))
+            return
+        file = discord.File(io.BytesIO(img), filename=filename)
+        await interaction.edit_original_response(content=content, attachments=[file])
 
     @app_commands.command(name="time_of_day", description="Show your focus completions by hour of day")
     async def time_of_day(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         user = await db.get_user(interaction.user.id)
-        logs: List[int] = list(user.get("focus_log", []))
-        if not logs:
+        stats = focusstats.for_user(user)
+        if not stats["total"]:
             await interaction.edit_original_response(content="No focus data yet.")
             return
-        # Build 24-bin histogram local time
-        counts = [0] * 24
-        for ts in logs:
-            h = dt.datetime.fromtimestamp(int(ts)).hour
-            counts[h] += 1
+        # 24-bin histogram by the user's local hour
+        counts = list(stats["hours"])
         labels = [f"{h:02d}" for h in range(24)]
-        img = self._render_bar(labels, counts, title="Completions by Hour")
-        file = discord.File(io.BytesIO(img), filename="time_of_day.png")
-        await interaction.edit_original_response(content="Completions by hour", attachments=[file])
+        await self._send_chart(interaction, labels, counts, "Completions by Hour", "time_of_day.png", "Completions by hour",
+                               user.get("theme", "aurora"))
 
     @app_commands.command(name="weekly_report", description="Your last 7 days of Pomodoro completions")
     async def weekly_report(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         user = await db.get_user(interaction.user.id)
-        logs: List[int] = list(user.get("focus_log", []))
-        if not logs:
+        stats = focusstats.for_user(user)
+        if not stats["total"]:
             await interaction.edit_original_response(content="No focus data yet.")
             return
-        now = int(time.time())
-        start = now - 6 * 86400
-        day_counts = [0] * 7
-        day_labels = []
-        for i in range(7):
-            d = dt.datetime.fromtimestamp(start + i * 86400)
-            day_labels.append(d.strftime("%a"))
-        for ts in logs:
-            if ts < start:
-                continue
-            idx = int((ts - start) // 86400)
-            if 0 <= idx < 7:
-                day_counts[idx] += 1
-        img = self._render_bar(day_labels, day_counts, title="Last 7 Days (Pomodoro Completions)")
+        # Last 7 local days, today included
+        today = focusstats.today(tz.for_user(user))
+        day_counts = focusstats.day_counts(stats, today, 7)
+        day_labels = [dt.date.fromordinal(d).strftime("%a") for d in range(today - 6, today + 1)]
         total = sum(day_counts)
-        file = discord.File(io.BytesIO(img), filename="weekly_report.png")
-        await interaction.edit_original_response(content=f"Total this week: {total}", attachments=[file])
+        await self._send_chart(interaction, day_labels, day_counts, "Last 7 Days (Pomodoro Completions)",
+                               "weekly_report.png", f"Total this week: {total}", user.get("theme", "aurora"))
+
+    @app_commands.command(name="chart_metrics", description="Admin: chart renderer and cache counters")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def chart_metrics(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        stats = self.renderer.stats()
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        hit_rate = (stats["hits"] + stats["disk_hits"]) / lookups * 100 if lookups else 0.0
+        lines = [
+            f"Cache: {stats['hits']} memory hits · {stats['disk_hits']} disk hits · {stats['misses']} misses ({hit_rate:.0f}% hit rate)",
+            f"Cached: {stats['items']} charts · {stats['bytes'] // 1024} KiB",
+            f"Renders: {stats['rendered']} done · {stats['rejected']} rejected (busy) · {stats['failed']} failed",
+            f"In flight: {stats['in_flight']}/{stats['capacity']} · engine {self.renderer.engine}",
+        ]
+        await interaction.edit_original_response(embed=embeds.base("Chart Metrics", "\n".join(lines)))
 
 
 async def setup(bot: commands.Bot):
@@ -8,6 +8,9 @@ from discord.ext import commands
 
 from utils import database as db
 from utils import embeds
+from utils import focusstats
+from utils import streaks
+from utils import tz
 
 
 class Aurora(commands.Cog):
@@ -19,12 +22,12 @@ class Aurora(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         user = await db.get_user(interaction.user.id)
         xp = int(user.get("xp", 0))
-        streak = int(user.get("streak", 0))
+        streak = streaks.current(user)
         pomos = int(user.get("pomos_completed", 0))
         last_focus = int(user.get("last_focus_ts", 0))
         now = int(time.time())
-        hour = dt.datetime.fromtimestamp(now).hour
-        logs: List[int] = list(user.get("focus_log", []))
+        hour = tz.for_user(user).hour(now)
+        stats = focusstats.for_user(user)
 
         parts: List[str] = []
         if hour < 9:
@@ -47,9 +50,8 @@ class Aurora(commands.Cog):
         if last_focus and now - last_focus > 4 * 3600:
             parts.append("It’s been a while. Start a fresh 25/5 to reset.")
 
-        if logs:
-            hours = [dt.datetime.fromtimestamp(int(ts)).hour for ts in logs]
-            peak = max(range(24), key=lambda h: hours.count(h))
+        if stats["total"]:
+            peak = focusstats.peak_hour(stats)
             parts.append(f"You tend to finish most around {peak:02d}:00—schedule a block then.")
 
         msg = " \n• ".join([parts[0]] + parts[1:]) if parts else "Let’s begin with a single 25/5. You’ve got this."
@@ -59,22 +61,15 @@ class Aurora(commands.Cog):
     async def weekly_reflection(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         user = await db.get_user(interaction.user.id)
-        logs: List[int] = list(user.get("focus_log", []))
-        if not logs:
+        stats = focusstats.for_user(user)
+        if not stats["total"]:
             await interaction.edit_original_response(embed=embeds.warn("No data yet. Try finishing a Pomodoro."))
             return
-        now = int(time.time())
-        start = now - 6 * 86400
-        per_day = [0] * 7
-        for ts in logs:
-            if ts < start:
-                continue
-            idx = int((ts - start) // 86400)
-            if 0 <= idx < 7:
-                per_day[idx] += 1
+        today = focusstats.today(tz.for_user(user))
+        per_day = focusstats.day_counts(stats, today, 7)
         total = sum(per_day)
         best = max(range(7), key=lambda i: per_day[i])
-        best_day = (dt.datetime.fromtimestamp(start) + dt.timedelta(days=best)).strftime("%A")
+        best_day = dt.date.fromordinal(today - 6 + best).strftime("%A")
         lines = [
             f"Total Pomodoros: {total}",
             f"Best day: {best_day} ({per_day[best]})",
@@ -86,15 +81,13 @@ class Aurora(commands.Cog):
     async def aurora_goal(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         user = await db.get_user(interaction.user.id)
-        logs: List[int] = list(user.get("focus_log", []))
-        if not logs:
+        stats = focusstats.for_user(user)
+        if not stats["total"]:
             await interaction.edit_original_response(embed=embeds.base("Aurora · Goal", "Start with 3 Pomodoros today."))
             return
-        now = int(time.time())
-        start = now - 14 * 86400
-        recent = [ts for ts in logs if ts >= start]
-        days = max(1, int((now - start) // 86400))
-        avg = len(recent) / days
+        # Average over the last 14 local days
+        days = 14
+        avg = sum(focusstats.day_counts(stats, focusstats.today(tz.for_user(user)), days)) / days
         goal = max(3, int(round(avg + 1)))
         await interaction.edit_original_response(embed=embeds.base("Aurora · Goal", f"Target {goal} Pomodoros today. Adjust if you finish early."))
 
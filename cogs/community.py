@@ -7,12 +7,39 @@ from discord.ext import commands
 
 from utils import database as db
 from utils import embeds
+from utils.eventbus import FocusCompleted, for_bot
 from utils.timeutils import progress_bar
 
 
 class Community(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.bus = for_bot(bot)
+
+    async def cog_load(self):
+        self.bus.subscribe(FocusCompleted, "challenge", self._count_challenge)
+        # Pings are best effort: drop them rather than stall the publisher when Discord is slow
+        self.bus.subscribe(FocusCompleted, "partner", self._ping_partner, queue_size=64, drop_when_full=True)
+
+    async def cog_unload(self):
+        self.bus.unsubscribe("challenge")
+        self.bus.unsubscribe("partner")
+
+    async def _count_challenge(self, event: FocusCompleted) -> None:
+        await db.increment_challenge(1, guild_id=event.guild_id)
+
+    async def _ping_partner(self, event: FocusCompleted) -> None:
+        if not event.live or not event.guild_id or not event.channel_id:
+            return
+        partner_id = await db.find_partner(event.user_id)
+        guild = self.bot.get_guild(event.guild_id)
+        channel = self.bot.get_channel(event.channel_id)
+        member = guild.get_member(partner_id) if partner_id and guild else None
+        if member and channel:
+            try:
+                await channel.send(f"🤝 Partner update: {member.mention}, your buddy just completed a focus session!")
+            except discord.HTTPException:
+                pass
 
     # Focus Party (creates a temporary voice channel and a discussion thread)
     @app_commands.command(name="party_start", description="Start a Focus Party: creates a voice room and a thread")
@@ -49,23 +76,22 @@ class Community(commands.Cog):
                 thread = None
         await interaction.edit_original_response(embed=embeds.success(f"Focus Party ready: {voice.name}{' with thread' if thread else ''}."))
 
-    # Weekly Challenge (global simple)
+    # Weekly Challenge (per server)
     @app_commands.command(name="challenge_set", description="Set the server weekly challenge goal (admin)")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def challenge_set(self, interaction: discord.Interaction, goal: int):
         await interaction.response.defer(ephemeral=True)
         goal = max(0, int(goal))
-        ch = await db.get_challenge()
-        ch["goal"] = goal
-        if ch.get("progress", 0) > goal:
-            ch["progress"] = goal
-        await db.set_challenge(ch)
+        async with db.challenge_txn(interaction.guild_id) as ch:
+            ch["goal"] = goal
+            if ch.get("progress", 0) > goal:
+                ch["progress"] = goal
         await interaction.edit_original_response(embed=embeds.success(f"Weekly challenge set to {goal} pomodoros."))
 
     @app_commands.command(name="challenge", description="Show current weekly challenge progress")
     async def challenge(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        ch = await db.get_challenge()
+        ch = await db.get_challenge(interaction.guild_id)
         goal = max(1, int(ch.get("goal", 0)) or 1)
         progress = int(ch.get("progress", 0))
         ratio = min(1.0, progress / goal)
@@ -1,14 +1,26 @@
 import asyncio
+import bisect
 import datetime as dt
+import logging
+import time
+from typing import List
 
 from discord.ext import commands, tasks
 
 from utils import database as db
+from utils import gamify
+from utils import streaks
+from utils import tz
+
+logger = logging.getLogger("aurorafocus")
 
 
 class Events(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # One run per job at a time: the task loops and the on_ready resume may overlap
+        self._job_locks = {"daily": asyncio.Lock(), "monthly": asyncio.Lock()}
+        self._resumed = False
         self.daily_reset.start()
         self.weekly_reset.start()
         self.monthly_rollover.start()
@@ -18,24 +30,96 @@ class Events(commands.Cog):
         self.weekly_reset.cancel()
         self.monthly_rollover.cancel()
 
-    @tasks.loop(hours=24)
-    async def daily_reset(self):
-        # Placeholder: increment streak for users who had activity; simple demo adds 1 to everyone with xp>0
-        # In future: track check-ins or focus session completions per user per day
-        from pathlib import Path
-        import json
-        users_path = (Path(__file__).resolve().parent.parent / "data" / "users.json")
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready fires again after reconnects; only migrate and resume once per process
+        if self._resumed:
+            return
+        self._resumed = True
+        # Split the old global users/challenge/hall of fame files into per-guild shards (runs once)
+        guilds = {g.id: [m.id for m in g.members] for g in self.bot.guilds}
         try:
-            users = json.loads(users_path.read_text(encoding="utf-8") or "{}")
+            migrated = await db.migrate_to_guild_shards(guilds)
+            if migrated:
+                logger.info("Migrated %d guilds to sharded storage", migrated)
         except Exception:
-            users = {}
-        changed = False
-        for uid, u in users.items():
-            if int(u.get("xp", 0)) > 0:
-                u["streak"] = int(u.get("streak", 0)) + 1
-                changed = True
-        if changed:
-            users_path.write_text(json.dumps(users, ensure_ascii=False, indent=2), encoding="utf-8")
+            logger.exception("Guild shard migration failed")
+        # Finish any job a previous process died in the middle of
+        jobs = (await db.get_season_state()).get("jobs", {})
+        daily, monthly = jobs.get("daily", {}), jobs.get("monthly", {})
+        if daily.get("run") and not daily.get("done"):
+            logger.info("Resuming daily job %s", daily["run"])
+            await self.run_daily(daily["run"])
+        if monthly.get("run") and not monthly.get("done"):
+            logger.info("Resuming month rollover %s", monthly["run"])
+            await self.run_monthly(monthly["run"], monthly.get("label", ""))
+
+    # Whole-user-base jobs walk user ids in chunks of db.JOB_CHUNK, yielding
+    # between chunks and checkpointing progress in the season state under
+    # "jobs", and a job that died part-way is run again from its checkpoint.
+    # The daily steps are idempotent. The monthly reset is not (it subtracts),
+    # so its snapshot is checkpointed first and each record is stamped with
+    # the run as it is reset; see _run_monthly.
+    async def _checkpoint(self, job: str, **fields) -> None:
+        async with db.season_txn() as state:
+            jobs = state.setdefault("jobs", {})
+            jobs[job] = {**jobs.get(job, {}), **fields}
+
+    async def _job_state(self, job: str, run: str) -> dict:
+        state = await db.get_season_state()
+        current = state.get("jobs", {}).get(job, {})
+        if current.get("run") != run:
+            current = {"run": run, "done": False}
+            await self._checkpoint(job, **current)
+        return current
+
+    async def _for_each_user(self, job: str, ids: List[int], after: int, step) -> None:
+        start = bisect.bisect_right(ids, after)
+        for i in range(start, len(ids), db.JOB_CHUNK):
+            chunk = ids[i:i + db.JOB_CHUNK]
+            for uid in chunk:
+                await step(uid)
+            await self._checkpoint(job, after=chunk[-1])
+            await asyncio.sleep(0)
+
+    async def run_daily(self, run: str) -> None:
+        """Daily streak pass for the date `run` (YYYY-MM-DD).
+
+        Streaks grow as focus phases complete (see utils.streaks); this pass
+        only zeroes the ones that broke, judged by each user's local date.
+        """
+        async with self._job_locks["daily"]:
+            await self._run_daily(run)
+
+    async def _run_daily(self, run: str) -> None:
+        job = await self._job_state("daily", run)
+        if job.get("done"):
+            return
+        now = time.time()
+
+        async def step(uid: int) -> None:
+            u = await db.get_user(uid)
+            if "activity" not in u:
+                # Record from before activity tracking: derive the streak from focus history once.
+                # Legacy records without a streak are seeded on their next completion instead.
+                await gamify.rebuild_focus_stats(uid)
+                return
+            if not streaks.is_broken(u, tz.for_user(u).day(now)):
+                return
+            async with db.user_txn(uid) as fresh:
+                if streaks.is_broken(fresh, tz.for_user(fresh).day(now)):
+                    fresh["streak"] = 0
+
+        # No local date is more than a day ahead of UTC, so a streak can only
+        # have broken if its last active day is before today's UTC date
+        utc_today = dt.datetime.fromtimestamp(now, dt.timezone.utc).toordinal()
+        candidates = await db.streak_candidates(utc_today)
+        await self._for_each_user("daily", candidates, int(job.get("after", -1)), step)
+        await self._checkpoint("daily", done=True)
+
+    @tasks.loop(hours=24)
+    async def daily_reset(self):
+        await self.run_daily(dt.date.today().isoformat())
 
     @tasks.loop(hours=168)
     async def weekly_reset(self):
@@ -45,7 +129,6 @@ class Events(commands.Cog):
     @tasks.loop(hours=24)
     async def monthly_rollover(self):
         # Run once a day; will only trigger actual rollover at month change
-        import json
         now = dt.datetime.utcnow()
         ym = now.strftime("%Y-%m")
         state = await db.get_season_state()
@@ -56,33 +139,54 @@ class Events(commands.Cog):
         first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         prev_last_day = first_of_month - dt.timedelta(days=1)
         label = prev_last_day.strftime("%Y-%m")
-        # Load users and compute rankings by monthly_xp
-        from pathlib import Path
-        users_path = (Path(__file__).resolve().parent.parent / "data" / "users.json")
-        try:
-            users = json.loads(users_path.read_text(encoding="utf-8") or "{}")
-        except Exception:
-            users = {}
-        ranking = []
-        for uid, u in users.items():
-            ranking.append({"user_id": int(uid), "monthly_xp": int(u.get("monthly_xp", 0)), "xp": int(u.get("xp", 0))})
-        ranking.sort(key=lambda r: (-r["monthly_xp"], -r["xp"]))
-        top10 = ranking[:10]
-        # Save to Hall of Fame
-        hof = await db.get_hof()
-        hof[label] = top10
-        await db.set_hof(hof)
-        # Reset monthly_xp
-        changed = False
-        for uid, u in users.items():
-            if int(u.get("monthly_xp", 0)) != 0:
-                u["monthly_xp"] = 0
-                changed = True
-        if changed:
-            users_path.write_text(json.dumps(users, ensure_ascii=False, indent=2), encoding="utf-8")
-        # Update state
-        state["last_rollover"] = ym
-        await db.set_season_state(state)
+        await self.run_monthly(ym, label)
+
+    async def run_monthly(self, ym: str, label: str) -> None:
+        """Month rollover: snapshot each scope's top 10 as `label`, then reset monthly_xp.
+
+        Scopes are the global users (DM use) and every guild shard. The
+        snapshot of a scope is checkpointed before its reset starts, so a
+        resumed run never snapshots half-reset data.
+        """
+        async with self._job_locks["monthly"]:
+            await self._run_monthly(ym, label)
+
+    async def _run_monthly(self, ym: str, label: str) -> None:
+        job = await self._job_state("monthly", ym)
+        if job.get("done"):
+            return
+        job.setdefault("label", label)
+        await self._checkpoint("monthly", label=job["label"])
+        snapshotted = list(job.get("snapshotted", []))
+        reset = list(job.get("reset", []))
+        amounts = dict(job.get("amounts", {}))
+        for guild_id in [None] + await db.guild_ids():
+            scope = str(guild_id or "global")
+            if scope not in snapshotted:
+                top10 = [
+                    {"user_id": uid, "monthly_xp": int(u.get("monthly_xp", 0)), "xp": int(u.get("xp", 0))}
+                    for uid, u in await db.top_users(("monthly_xp", "xp"), 10, guild_id=guild_id)
+                ]
+                hof = await db.get_hof(guild_id)
+                hof[job["label"]] = top10
+                await db.set_hof(hof, guild_id)
+                snapshotted.append(scope)
+                await self._checkpoint("monthly", snapshotted=snapshotted)
+            if scope not in reset:
+                # The snapshot is checkpointed (and flushed) before anything is
+                # subtracted: a resumed run reuses it instead of snapshotting XP
+                # granted since, and the per-record stamp skips users already done
+                if scope not in amounts:
+                    amounts[scope] = await db.monthly_xp_snapshot(guild_id)
+                    await self._checkpoint("monthly", amounts=amounts)
+                    await db.flush()
+                await db.subtract_monthly_xp(amounts[scope], guild_id, run=ym)
+                reset.append(scope)
+                del amounts[scope]
+                await self._checkpoint("monthly", reset=reset, amounts=amounts)
+        async with db.season_txn() as state:
+            state["last_rollover"] = ym
+            state.setdefault("jobs", {}).setdefault("monthly", {})["done"] = True
 
     @daily_reset.before_loop
     async def before_daily(self):
@@ -1,6 +1,8 @@
 import asyncio
+import logging
 import time
-from typing import Optional
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
 
 import discord
 from discord import app_commands
@@ -10,12 +12,40 @@ from utils import database as db
 from utils import embeds
 from utils.timeutils import progress_bar, format_duration
 from utils import gamify
+from utils.afk import AFK_STRIKE_LIMIT, CONFIRM_EMOJI, AfkPrompt, AfkTracker
+from utils.eventbus import FocusCompleted, for_bot
+from utils.scheduler import DeadlineScheduler
+from utils.embed_edits import EmbedEditDispatcher, refresh_cadence
 
+logger = logging.getLogger("aurorafocus")
+
+# Sessions whose deadline passed longer ago than this are closed on startup
+# instead of resumed (the bot was down for a long time).
+STALE_SESSION_SEC = 6 * 3600
 
 class Pomodoro(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.update_interval = int(getattr(bot, "config", {}).get("update_interval_sec", 5))
+        # Running sessions by channel id; the scheduler holds one wake-up per session
+        self.sessions: Dict[int, dict] = {}
+        self.messages: Dict[int, discord.Message] = {}
+        self.scheduler = DeadlineScheduler(self._on_due)
+        self.editor = EmbedEditDispatcher()
+        self.bus = for_bot(bot)
+        self.afk = AfkTracker(self._on_afk_results)
+        self._resumed = False
+
+    async def cog_load(self):
+        self.scheduler.start()
+        self.afk.start()
+        # Rewards run off the ticker; more than one worker since each user's txn is locked separately
+        self.bus.subscribe(FocusCompleted, "rewards", lambda e: gamify.on_focus_completed(self.bot, e), workers=2)
+
+    async def cog_unload(self):
+        self.scheduler.stop()
+        self.afk.stop()
+        self.bus.unsubscribe("rewards")
 
     async def _start_session(self, target_channel: discord.abc.Messageable, owner: discord.User,
                              focus: int, short_break: int, long_break: int, cycles: int) -> discord.Message:
@@ -32,16 +62,17 @@ class Pomodoro(commands.Cog):
             "paused": False,
             "owner_id": owner.id,
         }
-        await db.set_session(channel_id, session)
-
         try:
             await db.update_user(owner.id, {"afk_strikes": 0})
         except Exception:
             pass
 
-        # Send initial message
+        # Send initial message, then persist with its id so the session survives a restart
         msg = await target_channel.send(embed=self._build_embed(session))
-        self.bot.loop.create_task(self._ticker(msg, channel_id))
+        session["channel_id"] = channel_id
+        session["message_id"] = msg.id
+        await db.set_session(channel_id, session)
+        self._track(channel_id, msg, session)
         return msg
 
     @app_commands.command(name="pomodoro", description="Start a Pomodoro session in this channel")
@@ -109,136 +140,227 @@ class Pomodoro(commands.Cog):
         await self._start_session(target_channel, interaction.user, focus, short_break, long_break, cycles or 4)
         await interaction.edit_original_response(embed=embeds.success(f"Started in {'thread' if isinstance(target_channel, discord.Thread) else 'channel'}: {getattr(target_channel, 'name', '')}"))
 
-    async def _ticker(self, message: discord.Message, channel_id: int):
+    def _track(self, channel_id: int, message: discord.Message, session: dict) -> None:
+        self.sessions[channel_id] = session
+        self.messages[channel_id] = message
+        self._schedule_next(channel_id)
+
+    def _untrack(self, channel_id: int) -> Optional[discord.Message]:
+        self.sessions.pop(channel_id, None)
+        self.scheduler.cancel(channel_id)
+        self.editor.forget(channel_id, channel_id)
+        return self.messages.pop(channel_id, None)
+
+    def _schedule_next(self, channel_id: int, delay: Optional[float] = None) -> None:
+        session = self.sessions.get(channel_id)
+        if session is None:
+            return
+        now = time.time()
+        if delay is not None:
+            due = now + delay
+        elif session.get("paused"):
+            # Nothing changes while paused; pause/resume reschedule immediately
+            due = now + max(self.update_interval, 60)
+        else:
+            # Wake for the next countdown refresh or the phase end, whichever is first
+            remaining = int(session["ends_at"] - now)
+            due = min(session["ends_at"], now + refresh_cadence(remaining, self.update_interval))
+        self.scheduler.schedule(channel_id, due)
+
+    async def _on_due(self, channel_ids: List[int]) -> None:
+        # Runs on the scheduler task: hand everything slow to separate tasks
+        now = time.time()
+        refresh: List[int] = []
+        for channel_id in channel_ids:
+            session = self.sessions.get(channel_id)
+            if session is None:
+                continue
+            if not session.get("paused") and int(session["ends_at"] - now) <= 0:
+                self.bot.loop.create_task(self._finish_phase(channel_id))
+            else:
+                refresh.append(channel_id)
+        if refresh:
+            self.bot.loop.create_task(self._refresh(refresh))
+
+    async def _refresh(self, channel_ids: List[int]) -> None:
+        async def edit(channel_id: int):
+            session = self.sessions.get(channel_id)
+            message = self.messages.get(channel_id)
+            if session is None or message is None:
+                return
+            try:
+                await self.editor.edit(channel_id, message, self._build_embed(session))
+            except discord.HTTPException:
+                pass
+
+        await asyncio.gather(*(edit(cid) for cid in channel_ids))
+        for channel_id in channel_ids:
+            self._schedule_next(channel_id)
+
+    async def _end_message(self, message: Optional[discord.Message]) -> None:
+        # Try clean up embed when session ends
+        if message is None:
+            return
         try:
-            while True:
-                session = await db.get_session(channel_id)
-                if not session:
-                    break
-                if session.get("paused"):
-                    try:
-                        await message.edit(embed=self._build_embed(session))
-                    except discord.HTTPException:
-                        pass
-                    await asyncio.sleep(self.update_interval)
-                    continue
+            await message.edit(embed=embeds.success("Session ended."))
+        except Exception:
+            pass
 
-                now = time.time()
-                remaining = int(session["ends_at"] - now)
-                if remaining <= 0:
-                    # Focus completed -> grant XP and track pomo
-                    completed_focus = (session.get("phase") == "focus")
-                    owner_id = session.get("owner_id")
-                    channel = message.channel if hasattr(message, "channel") else None
-                    guild = channel.guild if channel and hasattr(channel, "guild") else None
-
-                    prev_phase = session.get("phase")
-                    session = await self._advance_phase(session)
-                    await db.set_session(channel_id, session)
-                    if completed_focus and owner_id:
-                        try:
-                            await gamify.record_focus_completion(int(owner_id))
-                            try:
-                                await db.update_user(int(owner_id), {"last_focus_ts": int(now)})
-                            except Exception:
-                                pass
-                            # Append to focus_log (bounded)
-                            try:
-                                user = await db.get_user(int(owner_id))
-                                log = list(user.get("focus_log", []))
-                                log.append(int(now))
-                                if len(log) > 1000:
-                                    log = log[-1000:]
-                                user["focus_log"] = log
-                                await db.set_user(int(owner_id), user)
-                            except Exception:
-                                pass
-                            res = await gamify.grant_xp_and_check(self.bot, int(owner_id), delta=15, guild=guild)
-                            granted = await gamify.check_basic_achievements(self.bot, int(owner_id), when_ts=now)
-                            # Coins reward
-                            try:
-                                u = await db.get_user(int(owner_id))
-                                u["coins"] = int(u.get("coins", 0)) + 5
-                                await db.set_user(int(owner_id), u)
-                            except Exception:
-                                pass
-                            # Increment server challenge progress
-                            try:
-                                await db.increment_challenge(1)
-                            except Exception:
-                                pass
-                            # Partner notification
-                            try:
-                                partner_id = await db.find_partner(int(owner_id))
-                                if partner_id and channel:
-                                    member = channel.guild.get_member(partner_id) if guild else None
-                                    if member:
-                                        await channel.send(f"🤝 Partner update: {member.mention}, your buddy just completed a focus session!")
-                            except Exception:
-                                pass
-                            # Announce level-up or achievements
-                            texts = []
-                            if res.get("leveled_up"):
-                                texts.append(f"🎉 Level Up! You reached Level {res.get('new_level')}.")
-                            if granted:
-                                texts.append("Achievements: " + ", ".join(granted))
-                            if texts and channel:
-                                try:
-                                    await channel.send(" ".join(texts))
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                    # AFK check at end of phase that ends the whole session
-                    if session.get("phase") not in ("short_break", "long_break") and owner_id and channel:
-                        try:
-                            prompt = await channel.send(f"{message.author.mention if hasattr(message, 'author') else ''} <@{owner_id}> session ended. React with ✅ within 30s to confirm.")
-                            try:
-                                await prompt.add_reaction("✅")
-                            except Exception:
-                                pass
-                            def check(reaction, user):
-                                return reaction.message.id == prompt.id and str(reaction.emoji) == "✅" and user and user.id == owner_id
-                            reacted = False
-                            try:
-                                reaction, user = await self.bot.wait_for("reaction_add", timeout=30.0, check=check)
-                                reacted = True
-                            except asyncio.TimeoutError:
-                                reacted = False
-                            u = await db.get_user(int(owner_id))
-                            strikes = int(u.get("afk_strikes", 0))
-                            if reacted:
-                                strikes = 0
-                            else:
-                                strikes += 1
-                            u["afk_strikes"] = strikes
-                            await db.set_user(int(owner_id), u)
-                            if not reacted and strikes >= 3:
-                                # Disconnect from VC if present
-                                try:
-                                    if guild:
-                                        member = guild.get_member(int(owner_id))
-                                        if member and member.voice and member.voice.channel:
-                                            await member.move_to(None, reason="AFK strikes reached")
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-                    await asyncio.sleep(1)
+    async def _finish_phase(self, channel_id: int) -> None:
+        session = self.sessions.get(channel_id)
+        message = self.messages.get(channel_id)
+        if session is None or message is None:
+            return
+        now = time.time()
+        try:
+            # Focus completed -> grant XP and track pomo
+            completed_focus = (session.get("phase") == "focus")
+            owner_id = session.get("owner_id")
+            channel = message.channel if hasattr(message, "channel") else None
+            guild = channel.guild if channel and hasattr(channel, "guild") else None
+
+            session = await self._advance_phase(session)
+            # A /pomodoro_stop (or a new session) may have landed while we awaited;
+            # never write a stopped session back or it comes back on restart
+            if self.sessions.get(channel_id) is not session:
+                return
+            await db.set_session(channel_id, session)
+            current = self.sessions.get(channel_id)
+            if current is not session:
+                # Stopped or replaced during the write: put the store back in line with memory
+                if current is None:
+                    await db.delete_session(channel_id)
                 else:
+                    await db.set_session(channel_id, current)
+                return
+            # Show the new phase before the slower reward and announcement work
+            try:
+                await self.editor.edit(channel_id, message, self._build_embed(session), priority=True)
+            except discord.HTTPException:
+                pass
+            if completed_focus and owner_id:
+                # Rewards, challenge progress and partner pings are event bus subscribers
+                await self.bus.publish(FocusCompleted(int(owner_id), now, guild.id if guild else None, channel_id))
+            # AFK check at end of phase that ends the whole session; the tracker settles it later
+            if session.get("phase") not in ("short_break", "long_break") and owner_id and channel:
+                try:
+                    prompt = await channel.send(f"{message.author.mention if hasattr(message, 'author') else ''} <@{owner_id}> session ended. React with {CONFIRM_EMOJI} within {int(self.afk.timeout)}s to confirm.")
+                    self.afk.add(prompt.id, int(owner_id), guild.id if guild else None)
                     try:
-                        await message.edit(embed=self._build_embed(session))
-                    except discord.HTTPException:
+                        await prompt.add_reaction(CONFIRM_EMOJI)
+                    except Exception:
                         pass
-                    await asyncio.sleep(self.update_interval)
+                except Exception:
+                    pass
         finally:
-            # Try clean up embed when session ends
+            # A stopped or replaced session must not get a timer from this phase
+            if self.sessions.get(channel_id) is session:
+                self._schedule_next(channel_id, delay=1)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        if payload.message_id in self.afk:
+            self.afk.resolve(payload.message_id, payload.user_id, str(payload.emoji))
+
+    async def _on_afk_results(self, results: List[Tuple[AfkPrompt, bool]]) -> None:
+        # Runs on the tracker's timer task: one batch of strike updates, disconnects in their own tasks
+        strikes = await db.apply_afk_results([(p.user_id, reacted) for p, reacted in results])
+        for prompt, reacted in results:
+            if not reacted and prompt.guild_id and strikes.get(prompt.user_id, 0) >= AFK_STRIKE_LIMIT:
+                self.bot.loop.create_task(self._disconnect_afk(prompt.guild_id, prompt.user_id))
+
+    async def _disconnect_afk(self, guild_id: int, user_id: int) -> None:
+        # Disconnect from VC if present
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(user_id) if guild else None
+        if member and member.voice and member.voice.channel:
             try:
-                await message.edit(embed=embeds.success("Session ended."))
-            except Exception:
+                await member.move_to(None, reason="AFK strikes reached")
+            except discord.HTTPException:
                 pass
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready fires again after reconnects; only rehydrate once per process
+        if self._resumed:
+            return
+        self._resumed = True
+        try:
+            await self._resume_sessions()
+        except Exception:
+            logger.exception("Failed to resume pomodoro sessions")
+
+    async def _resume_sessions(self) -> None:
+        """Re-attach every persisted session after a restart, from a single read of the session store."""
+        sessions = await db.get_sessions()
+        now = time.time()
+        credits = []
+        for key, session in sessions.items():
+            channel_id = int(key)
+            if channel_id in self.sessions:
+                continue
+            channel = self.bot.get_channel(channel_id)
+            stale = not session.get("paused") and now - float(session.get("ends_at", 0)) > STALE_SESSION_SEC
+            if channel is None or stale or "phase" not in session:
+                await db.delete_session(channel_id)
+                continue
+            missed = [] if session.get("paused") else self._catch_up(session, now)
+            if session.get("message_id"):
+                message = channel.get_partial_message(int(session["message_id"]))
+            else:
+                # Sessions saved before message ids were stored get a fresh message
+                try:
+                    message = await channel.send(embed=self._build_embed(session))
+                except discord.HTTPException:
+                    await db.delete_session(channel_id)
+                    continue
+                session["message_id"] = message.id
+            session["channel_id"] = channel_id
+            # Persist the caught-up session before crediting, so a crash here never credits twice
+            await db.set_session(channel_id, session)
+            self._track(channel_id, message, session)
+            if missed and session.get("owner_id"):
+                credits.append((int(session["owner_id"]), getattr(channel, "guild", None), missed))
+
+        credited = 0
+        for owner_id, guild, missed in credits:
+            for ts in missed:
+                await self.bus.publish(FocusCompleted(owner_id, ts, guild.id if guild else None, live=False))
+                credited += 1
+        logger.info("Resumed %d pomodoro sessions; credited %d missed focus completions", len(self.sessions), credited)
+
+    def _catch_up(self, session: dict, now: float) -> List[float]:
+        """Advance a session past every deadline missed while offline.
+
+        Whole rounds (cycle 1 focus through the long break) are skipped
+        arithmetically. Returns the end times of the completed focus phases,
+        at most one round's worth (`cycles`), which the caller credits once.
+        """
+        cycles = max(1, int(session["cycles"]))
+        focus = int(session["focus"]) * 60
+        short_break = int(session["short_break"]) * 60
+        long_break = int(session["long_break"]) * 60
+        round_sec = cycles * focus + (cycles - 1) * short_break + long_break
+        completed: Deque[float] = deque(maxlen=cycles)
+        while session["ends_at"] <= now:
+            if session["phase"] == "focus" and session["current_cycle"] == 1 and round_sec > 0:
+                start = session["ends_at"] - focus
+                rounds = int((now - start) // round_sec)
+                if rounds > 0:
+                    last_round = start + (rounds - 1) * round_sec
+                    for c in range(1, cycles + 1):
+                        completed.append(last_round + c * focus + (c - 1) * short_break)
+                    session["ends_at"] = start + rounds * round_sec + focus
+                    continue
+            if session["phase"] == "focus":
+                completed.append(session["ends_at"])
+            self._advance_phase_at(session, session["ends_at"])
+        return list(completed)
+
     async def _advance_phase(self, session: dict) -> dict:
+        return self._advance_phase_at(session, time.time())
+
+    def _advance_phase_at(self, session: dict, start: float) -> dict:
         phase = session["phase"]
         if phase == "focus":
             if session["current_cycle"] % session["cycles"] == 0:
@@ -247,7 +369,7 @@ class Pomodoro(commands.Cog):
             else:
                 session["phase"] = "short_break"
                 duration = session["short_break"]
-            session["ends_at"] = time.time() + duration * 60
+            session["ends_at"] = start + duration * 60
         else:
             # break -> next focus
             if phase in ("short_break", "long_break"):
@@ -257,7 +379,7 @@ class Pomodoro(commands.Cog):
                     session["current_cycle"] += 1
                 session["phase"] = "focus"
                 duration = session["focus"]
-                session["ends_at"] = time.time() + duration * 60
+                session["ends_at"] = start + duration * 60
         return session
 
     def _build_embed(self, session: dict) -> discord.Embed:
@@ -289,12 +411,13 @@ class Pomodoro(commands.Cog):
             await interaction.edit_original_response(embed=embeds.warn("No active session in this channel."))
             return
         await db.delete_session(interaction.channel_id)
+        self.bot.loop.create_task(self._end_message(self._untrack(interaction.channel_id)))
         await interaction.edit_original_response(embed=embeds.success("Stopped the session."))
 
     @app_commands.command(name="pomodoro_pause", description="Pause the current Pomodoro session")
     async def pomodoro_pause(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        session = await db.get_session(interaction.channel_id)
+        session = self.sessions.get(interaction.channel_id) or await db.get_session(interaction.channel_id)
         if not session:
             await interaction.edit_original_response(embed=embeds.warn("No active session."))
             return
@@ -305,12 +428,13 @@ class Pomodoro(commands.Cog):
         session["paused"] = True
         session["pause_remaining"] = remaining
         await db.set_session(interaction.channel_id, session)
+        self._schedule_next(interaction.channel_id, delay=0)
         await interaction.edit_original_response(embed=embeds.success("Paused."))
 
     @app_commands.command(name="pomodoro_resume", description="Resume the current Pomodoro session")
     async def pomodoro_resume(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        session = await db.get_session(interaction.channel_id)
+        session = self.sessions.get(interaction.channel_id) or await db.get_session(interaction.channel_id)
         if not session:
             await interaction.edit_original_response(embed=embeds.warn("No active session."))
             return
@@ -322,23 +446,49 @@ class Pomodoro(commands.Cog):
         session.pop("pause_remaining", None)
         session["ends_at"] = time.time() + remaining
         await db.set_session(interaction.channel_id, session)
+        self._schedule_next(interaction.channel_id, delay=0)
         await interaction.edit_original_response(embed=embeds.success("Resumed."))
 
+    @app_commands.command(name="pomodoro_metrics", description="Admin: timer scheduler and event bus counters")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def pomodoro_metrics(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        stats = self.scheduler.stats()
+        edits = self.editor.stats()
+        # A fixed-interval refresher would send one edit per update_interval per session
+        fixed_rate = 3600 / max(1, self.update_interval)
+        lines = [
+            f"Active sessions: {len(self.sessions)}",
+            f"Scheduled wake-ups: {stats['scheduled']} (heap {stats['heap_size']})",
+            f"Wake-ups: {stats['wakeups']} · deadlines fired: {stats['fired']}",
+            f"Tick lag: last {stats['last_lag_ms']} ms · max {stats['max_lag_ms']} ms",
+            f"Embed edits: sent {edits['sent']} · unchanged {edits['skipped_same']} · over budget {edits['deferred']}",
+            f"Edits per session-hour: {edits['sent_per_session_hour']} (fixed interval: {fixed_rate:.0f})",
+        ]
+        afk = self.afk.stats()
+        lines.append(f"AFK prompts: {afk['pending']} pending · {afk['confirmed']} confirmed · {afk['expired']} expired")
+        for name, sub in sorted(self.bus.stats().items()):
+            lines.append(
+                f"Bus {name}: queued {sub['queued']}/{sub['queue_size']} · handled {sub['handled']} · "
+                f"failed {sub['failed']} · dropped {sub['dropped']} · publisher waits {sub['waited']} · "
+                f"wait avg {sub['avg_wait_ms']} ms · run avg {sub['avg_run_ms']} ms (max {sub['max_run_ms']} ms)"
+            )
+        await interaction.edit_original_response(embed=embeds.base("Pomodoro Metrics", "\n".join(lines)))
+
     @app_commands.command(name="preset_create", description="Create a timer preset")
     @app_commands.describe(name="Preset name", focus="Focus minutes", short_break="Short break minutes", long_break="Long break minutes", cycles="Cycles before long break")
     async def preset_create(self, interaction: discord.Interaction, name: str, focus: int, short_break: int, long_break: int, cycles: int):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        presets = user.get("presets", [])
         name = name.strip()[:32]
-        for p in presets:
-            if p.get("name").lower() == name.lower():
-                p.update({"focus": focus, "short_break": short_break, "long_break": long_break, "cycles": cycles})
-                break
-        else:
-            presets.append({"name": name, "focus": focus, "short_break": short_break, "long_break": long_break, "cycles": cycles})
-        user["presets"] = presets
-        await db.set_user(interaction.user.id, user)
+        async with db.user_txn(interaction.user.id) as user:
+            presets = user.get("presets", [])
+            for p in presets:
+                if p.get("name").lower() == name.lower():
+                    p.update({"focus": focus, "short_break": short_break, "long_break": long_break, "cycles": cycles})
+                    break
+            else:
+                presets.append({"name": name, "focus": focus, "short_break": short_break, "long_break": long_break, "cycles": cycles})
+            user["presets"] = presets
         await interaction.edit_original_response(embed=embeds.success(f"Preset '{name}' saved."))
 
     @app_commands.command(name="preset_list", description="List your presets")
@@ -359,14 +509,16 @@ class Pomodoro(commands.Cog):
     @app_commands.command(name="preset_set_default", description="Set your default preset")
     async def preset_set_default(self, interaction: discord.Interaction, name: str):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        presets = user.get("presets", [])
-        for p in presets:
-            if p.get("name").lower() == name.lower():
-                user["default_preset"] = p.get("name")
-                await db.set_user(interaction.user.id, user)
-                await interaction.edit_original_response(embed=embeds.success(f"Default preset set to '{p.get('name')}'."))
-                return
+        found = None
+        async with db.user_txn(interaction.user.id) as user:
+            for p in user.get("presets", []):
+                if p.get("name").lower() == name.lower():
+                    found = p.get("name")
+                    user["default_preset"] = found
+                    break
+        if found:
+            await interaction.edit_original_response(embed=embeds.success(f"Default preset set to '{found}'."))
+            return
         await interaction.edit_original_response(embed=embeds.error("Preset not found."))
 
     @app_commands.command(name="preset_use", description="Start a session using a named preset")
@@ -409,9 +561,11 @@ class Pomodoro(commands.Cog):
             "paused": False,
             "owner_id": interaction.user.id,
         }
-        await db.set_session(channel_id, session)
         message = await interaction.edit_original_response(embed=self._build_embed(session))
-        self.bot.loop.create_task(self._ticker(message, channel_id))
+        session["channel_id"] = channel_id
+        session["message_id"] = message.id
+        await db.set_session(channel_id, session)
+        self._track(channel_id, message, session)
 
 
 async def setup(bot: commands.Bot):
@@ -1,36 +1,115 @@
 import asyncio
+import logging
 import time
-from pathlib import Path
-import json
+from typing import Dict, List, Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 
+from utils import database as db
 from utils import embeds
+from utils import tz
+from utils.scheduler import DeadlineScheduler
+
+logger = logging.getLogger("aurorafocus")
+
+# Pending reminders per user, and DMs sent at once by the dispatcher
+MAX_REMINDERS_PER_USER = 25
+DM_CONCURRENCY = 5
+# A reminder gets up to MAX_ATTEMPTS sends; after a failure the next one is
+# RETRY_DELAY_SEC later, doubling with each further failure
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SEC = 60
+# Inactivity nudges: at most one per user per NUDGE_MIN_GAP_SEC, NUDGE_CONCURRENCY DMs at once
+NUDGE_MIN_GAP_SEC = 3600
+NUDGE_CONCURRENCY = 5
 
 
 class Reminders(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.inactivity_check.start()
+        # Every pending /remindme lives in the reminders collection; one
+        # scheduler task wakes for the earliest due time and sends in batches.
+        self.scheduler = DeadlineScheduler(self._on_due)
+        self._pending: Dict[int, int] = {}
+        self._dm_slots = asyncio.Semaphore(DM_CONCURRENCY)
+        self.nudges = DeadlineScheduler(self._on_nudge_due)
+        self._nudge_slots = asyncio.Semaphore(NUDGE_CONCURRENCY)
+        self._member_guilds: Dict[int, int] = {}
+
+    async def cog_load(self):
+        for rid, reminder in (await db.get_reminders()).items():
+            self._schedule(rid, reminder)
+        self.scheduler.start()
+        now = time.time()
+        for uid, user in (await db.get_all_users()).items():
+            if user.get("reminders_enabled", False):
+                self._schedule_nudge(int(uid), user, now)
+        self.nudges.start()
 
     def cog_unload(self):
-        self.inactivity_check.cancel()
+        self.scheduler.stop()
+        self.nudges.stop()
+
+    def _schedule(self, rid: str, reminder: dict) -> None:
+        uid = int(reminder.get("user_id", 0))
+        if rid not in self.scheduler:
+            self._pending[uid] = self._pending.get(uid, 0) + 1
+        self.scheduler.schedule(rid, float(reminder.get("due", 0)))
+
+    def _done(self, uid: int) -> None:
+        left = self._pending.get(uid, 1) - 1
+        if left > 0:
+            self._pending[uid] = left
+        else:
+            self._pending.pop(uid, None)
+
+    async def _on_due(self, reminder_ids: List[str]) -> None:
+        # Runs on the scheduler task; sending happens on its own task
+        self.bot.loop.create_task(self._deliver(reminder_ids))
+
+    async def _deliver(self, reminder_ids: List[str]) -> None:
+        await self.bot.wait_until_ready()
+        await asyncio.gather(*(self._deliver_one(rid) for rid in reminder_ids), return_exceptions=True)
+
+    async def _deliver_one(self, rid: str) -> None:
+        reminder = await db.get_reminder(rid)
+        if reminder is None:
+            return
+        uid = int(reminder.get("user_id", 0))
+        async with self._dm_slots:
+            try:
+                user = self.bot.get_user(uid) or await self.bot.fetch_user(uid)
+                await user.send(f"⏰ Reminder: {reminder.get('message', '')}")
+            except (discord.Forbidden, discord.NotFound):
+                # DMs closed or account gone: retrying will not help
+                pass
+            except Exception as e:
+                # Network errors, rate limits, a failed fetch_user: try again later
+                reminder["attempts"] = int(reminder.get("attempts", 0)) + 1
+                if reminder["attempts"] < MAX_ATTEMPTS:
+                    reminder["due"] = int(time.time()) + RETRY_DELAY_SEC * 2 ** (reminder["attempts"] - 1)
+                    logger.info("Reminder %s for %s failed (%s); retry %d at %d", rid, uid, e, reminder["attempts"], reminder["due"])
+                    await db.set_reminder(rid, reminder)
+                    self.scheduler.schedule(rid, reminder["due"])
+                    return
+                logger.warning("Dropping reminder %s for %s after %d attempts: %s", rid, uid, reminder["attempts"], e)
+        await db.delete_reminder(rid)
+        self._done(uid)
 
     @app_commands.command(name="remindme", description="Remind you after N minutes with a message")
     @app_commands.describe(minutes="Delay in minutes", message="Reminder text")
     async def remindme(self, interaction: discord.Interaction, minutes: int, message: str):
         await interaction.response.defer(ephemeral=True)
         minutes = max(1, minutes)
+        if self._pending.get(interaction.user.id, 0) >= MAX_REMINDERS_PER_USER:
+            await interaction.edit_original_response(embed=embeds.warn(f"You already have {MAX_REMINDERS_PER_USER} reminders pending."))
+            return
+        due = time.time() + minutes * 60
+        rid = await db.add_reminder(interaction.user.id, due, message[:1500])
+        self._schedule(rid, {"user_id": interaction.user.id, "due": due})
         await interaction.edit_original_response(embed=embeds.success(f"Okay, I'll remind you in {minutes} minutes."))
-        async def task():
-            await asyncio.sleep(minutes * 60)
-            try:
-                await interaction.user.send(f"⏰ Reminder: {message}")
-            except Exception:
-                pass
-        self.bot.loop.create_task(task())
 
     # Smart reminder preferences
     @app_commands.command(name="reminder_prefs", description="Set inactivity reminder preferences")
@@ -41,70 +120,101 @@ class Reminders(commands.Cog):
         quiet_start = max(0, min(23, quiet_start))
         quiet_end = max(0, min(23, quiet_end))
 
-        users_path = (Path(__file__).resolve().parent.parent / "data" / "users.json")
-        try:
-            data = json.loads(users_path.read_text(encoding="utf-8") or "{}")
-        except Exception:
-            data = {}
-        u = data.get(str(interaction.user.id), {})
-        u["reminders_enabled"] = bool(enable)
-        u["inactivity_hours"] = inactivity_hours
-        u["quiet_start"] = quiet_start
-        u["quiet_end"] = quiet_end
-        data[str(interaction.user.id)] = u
-        users_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        user = await db.update_user(interaction.user.id, {
+            "reminders_enabled": bool(enable),
+            "inactivity_hours": inactivity_hours,
+            "quiet_start": quiet_start,
+            "quiet_end": quiet_end,
+        })
+        self._schedule_nudge(interaction.user.id, user)
         await interaction.edit_original_response(embed=embeds.success("Reminder preferences saved."))
 
-    @tasks.loop(minutes=15)
-    async def inactivity_check(self):
+    # Inactivity nudges: each opted-in user sits in the nudge scheduler at the
+    # time they next become eligible, so only users who are due get looked at.
+    def _schedule_nudge(self, uid: int, user: dict, now: Optional[float] = None) -> None:
+        due = next_nudge_at(user, time.time() if now is None else now)
+        if due is None:
+            self.nudges.cancel(uid)
+        else:
+            self.nudges.schedule(uid, due)
+
+    async def _on_nudge_due(self, user_ids: List[int]) -> None:
+        self.bot.loop.create_task(self._nudge_batch(user_ids))
+
+    async def _nudge_batch(self, user_ids: List[int]) -> None:
         await self.bot.wait_until_ready()
-        users_path = (Path(__file__).resolve().parent.parent / "data" / "users.json")
-        try:
-            data = json.loads(users_path.read_text(encoding="utf-8") or "{}")
-        except Exception:
-            data = {}
-        now = int(time.time())
-        for uid, u in list(data.items()):
+        await asyncio.gather(*(self._nudge(uid) for uid in user_ids), return_exceptions=True)
+
+    def _resolve_member(self, uid: int) -> Optional[discord.abc.Messageable]:
+        """Member (or user) to DM, remembering which guild they were found in."""
+        gid = self._member_guilds.get(uid)
+        guild = self.bot.get_guild(gid) if gid else None
+        member = guild.get_member(uid) if guild else None
+        if member is None:
+            for g in self.bot.guilds:
+                member = g.get_member(uid)
+                if member is not None:
+                    self._member_guilds[uid] = g.id
+                    break
+            else:
+                self._member_guilds.pop(uid, None)
+        return member
+
+    async def _nudge(self, uid: int) -> None:
+        # The record may have changed since this was scheduled (new focus, new prefs)
+        user = await db.get_user(uid)
+        now = time.time()
+        due = next_nudge_at(user, now)
+        if due is None:
+            return
+        if due > now:
+            self.nudges.schedule(uid, due)
+            return
+        member = self._resolve_member(uid)
+        if member is None:
+            # Not in any shared guild right now; look again later
+            self.nudges.schedule(uid, now + NUDGE_MIN_GAP_SEC)
+            return
+        async with self._nudge_slots:
             try:
-                if not u.get("reminders_enabled", False):
-                    continue
-                last_focus = int(u.get("last_focus_ts", 0))
-                inactivity_hours = int(u.get("inactivity_hours", 4))
-                quiet_start = int(u.get("quiet_start", 0))
-                quiet_end = int(u.get("quiet_end", 6))
-                last_nudge = int(u.get("last_nudge_ts", 0))
-                # Quiet hours window check (wrap supported)
-                hour = int(time.localtime(now).tm_hour)
-                in_quiet = (quiet_start <= quiet_end and quiet_start <= hour < quiet_end) or (
-                    quiet_start > quiet_end and (hour >= quiet_start or hour < quiet_end)
-                )
-                if in_quiet:
-                    continue
-                if last_focus and now - last_focus < inactivity_hours * 3600:
-                    continue
-                if last_nudge and now - last_nudge < 3600:
-                    continue
-                member = None
-                # Try DM via any guild the bot shares; fallback to creating a DM by ID
-                for g in self.bot.guilds:
-                    m = g.get_member(int(uid))
-                    if m:
-                        member = m
-                        break
-                if member is None:
-                    continue
-                try:
-                    await member.send("👋 Haven’t seen a focus in a while — want to start a Pomodoro? Try /pomodoro or /preset_use.")
-                    u["last_nudge_ts"] = now
-                    data[uid] = u
-                except Exception:
-                    pass
+                await member.send("👋 Haven’t seen a focus in a while — want to start a Pomodoro? Try /pomodoro or /preset_use.")
             except Exception:
                 pass
-        try:
-            users_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        except Exception:
-            pass
+        user = await db.update_user(uid, {"last_nudge_ts": int(now)})
+        self._schedule_nudge(uid, user, now)
+
+
+def _in_quiet(hour: int, quiet_start: int, quiet_end: int) -> bool:
+    # Quiet hours window (wrap supported)
+    return (quiet_start <= quiet_end and quiet_start <= hour < quiet_end) or (
+        quiet_start > quiet_end and (hour >= quiet_start or hour < quiet_end)
+    )
+
+
+def next_nudge_at(user: dict, now: float) -> Optional[float]:
+    """When the user next qualifies for an inactivity nudge, or None if they opted out.
+
+    Eligible once they have been inactive for inactivity_hours and were not
+    nudged in the last hour; a time inside quiet hours (in the user's
+    timezone) moves to the end of the quiet window.
+    """
+    if not user.get("reminders_enabled", False):
+        return None
+    last_focus = int(user.get("last_focus_ts", 0))
+    last_nudge = int(user.get("last_nudge_ts", 0))
+    inactivity_hours = int(user.get("inactivity_hours", 4))
+    due = float(now)
+    if last_focus:
+        due = max(due, last_focus + inactivity_hours * 3600)
+    if last_nudge:
+        due = max(due, last_nudge + NUDGE_MIN_GAP_SEC)
+    quiet_start = int(user.get("quiet_start", 0))
+    quiet_end = int(user.get("quiet_end", 6))
+    clock = tz.for_user(user)
+    if _in_quiet(clock.hour(due), quiet_start, quiet_end):
+        local = int(due) + clock.offset(due)
+        due = int(due) + (quiet_end * 3600 - local % 86400) % 86400
+    return due
 
 
 async def setup(bot: commands.Bot):
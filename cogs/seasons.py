@@ -7,6 +7,8 @@ from discord.ext import commands
 
 from utils import database as db
 from utils import embeds
+from utils import gamify
+from utils import tz
 
 
 def _format_top(top: List[dict], guild: Optional[discord.Guild]) -> str:
@@ -37,30 +39,39 @@ class Seasons(commands.Cog):
     ])
     async def theme_set(self, interaction: discord.Interaction, theme: app_commands.Choice[str]):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        user["theme"] = theme.value
-        await db.set_user(interaction.user.id, user)
+        await db.update_user(interaction.user.id, {"theme": theme.value})
         await interaction.edit_original_response(embed=embeds.success(f"Theme set to {theme.value}."))
 
+    @app_commands.command(name="timezone_set", description="Set your timezone for stats, achievements and quiet hours")
+    @app_commands.describe(timezone="IANA name, e.g. Europe/Berlin or America/New_York")
+    async def timezone_set(self, interaction: discord.Interaction, timezone: str):
+        await interaction.response.defer(ephemeral=True)
+        timezone = timezone.strip()
+        if not tz.is_valid(timezone):
+            await interaction.edit_original_response(embed=embeds.warn("Unknown timezone. Pick one from the suggestions, e.g. Europe/Berlin."))
+            return
+        await db.update_user(interaction.user.id, {"tz": timezone})
+        # Hour and day buckets depend on the timezone, so recompute them from the full history
+        await gamify.rebuild_focus_stats(interaction.user.id)
+        await interaction.edit_original_response(embed=embeds.success(f"Timezone set to {tz.describe(tz.clock(timezone))}."))
+
+    @timezone_set.autocomplete("timezone")
+    async def timezone_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        return [app_commands.Choice(name=z, value=z) for z in tz.search(current)]
+
     @app_commands.command(name="season_stats", description="Your season (monthly) XP and top 10")
     async def season_stats(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        import json
-        from pathlib import Path
-        users_path = (Path(__file__).resolve().parent.parent / "data" / "users.json")
-        try:
-            users = json.loads(users_path.read_text(encoding="utf-8") or "{}")
-        except Exception:
-            users = {}
-        # Rank
-        ranking = []
-        for uid, u in users.items():
-            ranking.append({"user_id": int(uid), "monthly_xp": int(u.get("monthly_xp", 0)), "xp": int(u.get("xp", 0))})
-        ranking.sort(key=lambda r: (-r["monthly_xp"], -r["xp"]))
-        top10 = ranking[:10]
-        # Find user rank
-        rank = next((i + 1 for i, r in enumerate(ranking) if r["user_id"] == interaction.user.id), None)
-        you = next((r for r in ranking if r["user_id"] == interaction.user.id), {"monthly_xp": 0})
+        order = ("monthly_xp", "xp")
+        top10 = [
+            {"user_id": uid, "monthly_xp": int(u.get("monthly_xp", 0)), "xp": int(u.get("xp", 0))}
+            for uid, u in await db.top_users(order, 10, guild_id=interaction.guild_id)
+        ]
+        rank = await db.user_rank(interaction.user.id, order, guild_id=interaction.guild_id)
+        if interaction.guild_id is not None:
+            you = await db.get_member(interaction.guild_id, interaction.user.id)
+        else:
+            you = await db.get_user(interaction.user.id)
         desc = [
             f"Your monthly XP: {you.get('monthly_xp', 0)}",
             f"Rank: {rank or 'N/A'}",
@@ -79,7 +90,7 @@ class Seasons(commands.Cog):
             first = now.replace(day=1)
             prev = first - dt.timedelta(days=1)
             month = prev.strftime("%Y-%m")
-        hof = await db.get_hof()
+        hof = await db.get_hof(interaction.guild_id)
         top = hof.get(month, [])
         if not top:
             await interaction.edit_original_response(embed=embeds.warn("No snapshot for that month yet."))
@@ -73,55 +73,65 @@ class Shop(commands.Cog):
             await interaction.edit_original_response(embed=embeds.error("I need Manage Roles permission."))
             return
         member = interaction.guild.get_member(interaction.user.id)
+        # Take the coins first, re-checking the balance atomically, so a failed
+        # payment never leaves the role behind
+        async with db.user_txn(interaction.user.id) as user:
+            coins = int(user.get("coins", 0))
+            paid = coins >= price
+            if paid:
+                user["coins"] = coins - price
+        if not paid:
+            await interaction.edit_original_response(embed=embeds.warn("Not enough coins."))
+            return
         try:
             await member.add_roles(role, reason="Shop purchase")
-        except discord.Forbidden:
-            await interaction.edit_original_response(embed=embeds.error("Cannot assign role (role hierarchy)."))
+        except discord.HTTPException as e:
+            async with db.user_txn(interaction.user.id) as user:
+                user["coins"] = int(user.get("coins", 0)) + price
+            if isinstance(e, discord.Forbidden):
+                await interaction.edit_original_response(embed=embeds.error("Cannot assign role (role hierarchy). You were not charged."))
+            else:
+                await interaction.edit_original_response(embed=embeds.error("Could not assign the role. You were not charged."))
             return
-        user["coins"] = coins - price
-        await db.set_user(interaction.user.id, user)
         await interaction.edit_original_response(embed=embeds.success(f"Purchased {role.name} for {price} coins. Balance: {user['coins']}"))
 
     @app_commands.command(name="shop_add_role", description="Admin: add a color role to the shop")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def shop_add_role(self, interaction: discord.Interaction, role: discord.Role, price: int):
         await interaction.response.defer(ephemeral=True)
-        shop = await db.get_shop()
-        colors = list(shop.get("color_roles", []))
-        # Update if exists
-        for it in colors:
-            if it.get("name") == role.name:
-                it["price"] = int(price)
-                break
-        else:
-            colors.append({"name": role.name, "price": int(price)})
-        shop["color_roles"] = colors
-        await db.set_shop(shop)
+        async with db.shop_txn() as shop:
+            colors = list(shop.get("color_roles", []))
+            # Update if exists
+            for it in colors:
+                if it.get("name") == role.name:
+                    it["price"] = int(price)
+                    break
+            else:
+                colors.append({"name": role.name, "price": int(price)})
+            shop["color_roles"] = colors
         await interaction.edit_original_response(embed=embeds.success(f"Added/updated color role {role.name} @ {price} coins."))
 
     @app_commands.command(name="shop_add_special", description="Admin: add a special role to the shop")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def shop_add_special(self, interaction: discord.Interaction, role: discord.Role, price: int):
         await interaction.response.defer(ephemeral=True)
-        shop = await db.get_shop()
-        specials = list(shop.get("specials", []))
-        for it in specials:
-            if it.get("name") == role.name:
-                it["price"] = int(price)
-                break
-        else:
-            specials.append({"name": role.name, "price": int(price)})
-        shop["specials"] = specials
-        await db.set_shop(shop)
+        async with db.shop_txn() as shop:
+            specials = list(shop.get("specials", []))
+            for it in specials:
+                if it.get("name") == role.name:
+                    it["price"] = int(price)
+                    break
+            else:
+                specials.append({"name": role.name, "price": int(price)})
+            shop["specials"] = specials
         await interaction.edit_original_response(embed=embeds.success(f"Added/updated special role {role.name} @ {price} coins."))
 
     @app_commands.command(name="coins_grant", description="Admin: grant coins to a user")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def coins_grant(self, interaction: discord.Interaction, user: discord.Member, amount: int):
         await interaction.response.defer(ephemeral=True)
-        u = await db.get_user(user.id)
-        u["coins"] = int(u.get("coins", 0)) + int(amount)
-        await db.set_user(user.id, u)
+        async with db.user_txn(user.id) as u:
+            u["coins"] = int(u.get("coins", 0)) + int(amount)
         await interaction.edit_original_response(embed=embeds.success(f"Granted {amount} coins to {user.display_name}. New balance: {u['coins']}"))
 
 
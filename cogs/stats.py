@@ -7,6 +7,7 @@ from discord.ext import commands
 from utils import database as db
 from utils import embeds
 from utils import gamify
+from utils import streaks
 
 
 class Stats(commands.Cog):
@@ -18,7 +19,7 @@ class Stats(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         user = await db.get_user(interaction.user.id)
         xp = user.get("xp", 0)
-        streak = user.get("streak", 0)
+        streak = streaks.current(user)
         level, base_xp, next_total = gamify.xp_to_level(int(xp))
         to_next = max(0, int(next_total) - int(xp))
         pomos = int(user.get("pomos_completed", 0))
@@ -26,7 +27,7 @@ class Stats(commands.Cog):
         desc = (
             f"Level: {level}\n"
             f"XP: {xp} (next in {to_next})\n"
-            f"Streak: {streak} days\n"
+            f"Streak: {streak} days (best {int(user.get('longest_streak', 0))})\n"
             f"Pomodoros: {pomos}\n"
             f"Achievements: {ach}"
         )
@@ -35,20 +36,9 @@ class Stats(commands.Cog):
     @app_commands.command(name="leaderboard", description="Leaderboard by XP")
     async def leaderboard(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        # Load all users
-        from pathlib import Path
-        import json
-        users_path = (Path(__file__).resolve().parent.parent / "data" / "users.json")
-        try:
-            users = json.loads(users_path.read_text(encoding="utf-8") or "{}")
-        except Exception:
-            users = {}
-        items: List[Tuple[str, int]] = []
-        for uid, u in users.items():
-            items.append((uid, int(u.get("xp", 0))))
-        items.sort(key=lambda x: x[1], reverse=True)
+        items: List[Tuple[int, int]] = [(uid, int(u.get("xp", 0))) for uid, u in await db.top_users(("xp",), 10, guild_id=interaction.guild_id)]
         lines = []
-        for rank, (uid, xp) in enumerate(items[:10], start=1):
+        for rank, (uid, xp) in enumerate(items, start=1):
             member = interaction.guild.get_member(int(uid)) if interaction.guild else None
             name = member.display_name if member else f"User {uid}"
             lines.append(f"#{rank} {name} — {xp} XP")
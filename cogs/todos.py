@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Optional
 import time
 
 import discord
@@ -7,6 +7,7 @@ from discord.ext import commands
 
 from utils import database as db
 from utils import embeds
+from utils import gamify
 from utils.timeutils import format_duration
 
 
@@ -19,25 +20,6 @@ def _now_ts() -> int:
     return int(time.time())
 
 
-def _migrate_todos(raw) -> List[Dict[str, Any]]:
-    if not raw:
-        return []
-    if isinstance(raw, list) and raw and isinstance(raw[0], dict):
-        return raw
-    # old format: list of strings
-    conv: List[Dict[str, Any]] = []
-    for s in raw if isinstance(raw, list) else []:
-        conv.append({
-            "title": str(s),
-            "cat": "Personal",
-            "status": "Pending",
-            "priority": "normal",
-            "created": _now_ts(),
-            "due": None,
-        })
-    return conv
-
-
 def _status_icon(status: str) -> str:
     return {
         "Pending": "📝",
@@ -73,9 +55,6 @@ class Todos(commands.Cog):
     async def todo_add(self, interaction: discord.Interaction, text: str, category: Optional[app_commands.Choice[str]] = None,
                        priority: Optional[app_commands.Choice[str]] = None, due_in_hours: Optional[int] = None):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        todos: List[Dict[str, Any]] = _migrate_todos(user.get("todos", []))
-
         todo = {
             "title": text.strip(),
             "cat": (category.value if category else "Personal"),
@@ -84,10 +63,8 @@ class Todos(commands.Cog):
             "created": _now_ts(),
             "due": (_now_ts() + int(due_in_hours) * 3600) if due_in_hours else None,
         }
-        todos.append(todo)
-        user["todos"] = todos
-        await db.set_user(interaction.user.id, user)
-        await interaction.edit_original_response(embed=embeds.success("Added to your to-do list."))
+        todo_id = await db.add_todo(interaction.user.id, todo)
+        await interaction.edit_original_response(embed=embeds.success(f"Added to your to-do list as #{todo_id}."))
 
     @app_commands.command(name="todo_list", description="List your to-dos with optional filters")
     @app_commands.describe(status="Filter by status", category="Filter by category")
@@ -96,25 +73,14 @@ class Todos(commands.Cog):
     async def todo_list(self, interaction: discord.Interaction, status: Optional[app_commands.Choice[str]] = None,
                         category: Optional[app_commands.Choice[str]] = None):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        todos: List[Dict[str, Any]] = _migrate_todos(user.get("todos", []))
-        user["todos"] = todos  # persist migration
-        await db.set_user(interaction.user.id, user)
-
-        def matches(t: Dict[str, Any]) -> bool:
-            if status and t.get("status") != status.value:
-                return False
-            if category and t.get("cat") != category.value:
-                return False
-            return True
-
-        filtered = [t for t in todos if matches(t)]
+        filtered = await db.get_todos(interaction.user.id, status=status.value if status else None,
+                                      category=category.value if category else None)
         if not filtered:
             await interaction.edit_original_response(embed=embeds.warn("No tasks match your filters."))
             return
 
         lines: List[str] = []
-        for i, t in enumerate(filtered, start=1):
+        for i, t in filtered:
             icon = _status_icon(t.get("status"))
             prio = _priority_icon(t.get("priority", "normal"))
             due = t.get("due")
@@ -123,66 +89,52 @@ class Todos(commands.Cog):
                 due_str = ("overdue by " + format_duration(-remain)) if remain < 0 else ("due in " + format_duration(remain))
             else:
                 due_str = "no due"
-            lines.append(f"{i}. {icon} {prio} {t.get('title')} — {t.get('cat')} · {t.get('status')} · {due_str}")
+            lines.append(f"#{i} {icon} {prio} {t.get('title')} — {t.get('cat')} · {t.get('status')} · {due_str}")
 
         await interaction.edit_original_response(embed=embeds.base("Your To-Dos", "\n".join(lines)))
 
     @app_commands.command(name="todo_set_status", description="Update the status of a to-do by its number")
-    @app_commands.describe(index="Item number from /todo_list", status="New status")
+    @app_commands.describe(index="Item number (#) from /todo_list", status="New status")
     @app_commands.choices(status=[app_commands.Choice(name=s, value=s) for s in STATUS_CHOICES])
     async def todo_set_status(self, interaction: discord.Interaction, index: int, status: app_commands.Choice[str]):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        todos: List[Dict[str, Any]] = _migrate_todos(user.get("todos", []))
-        if not (1 <= index <= len(todos)):
+        if await db.update_todo(interaction.user.id, index, {"status": status.value}) is None:
             await interaction.edit_original_response(embed=embeds.error("Invalid index."))
             return
-        todos[index - 1]["status"] = status.value
-        user["todos"] = todos
-        await db.set_user(interaction.user.id, user)
         await interaction.edit_original_response(embed=embeds.success("Status updated."))
 
     @app_commands.command(name="todo_complete", description="Complete a to-do by its number and earn XP")
-    @app_commands.describe(index="Item number from /todo_list")
+    @app_commands.describe(index="Item number (#) from /todo_list")
     async def todo_complete(self, interaction: discord.Interaction, index: int):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        todos: List[Dict[str, Any]] = _migrate_todos(user.get("todos", []))
-        if not (1 <= index <= len(todos)):
+
+        def credit(user: dict, item: dict) -> int:
+            due = item.get("due")
+            on_time = (due is None) or (_now_ts() <= int(due))
+            xp = 10 if on_time else 5
+            gamify.add_xp(user, xp)
+            return xp
+
+        item, xp_gain = await db.complete_todo(interaction.user.id, index, credit)
+        if item is None:
             await interaction.edit_original_response(embed=embeds.error("Invalid index."))
             return
-
-        t = todos[index - 1]
-        t["status"] = "Done"
-        now = _now_ts()
-        due = t.get("due")
-        on_time = (due is None) or (now <= int(due))
-        xp_gain = 10 if on_time else 5
-        user["xp"] = int(user.get("xp", 0)) + xp_gain
-        user["todos"] = todos
-        await db.set_user(interaction.user.id, user)
-        msg = "Completed! +10 XP" if on_time else "Completed (overdue). +5 XP"
+        if not xp_gain:
+            await interaction.edit_original_response(embed=embeds.warn("That task is already done."))
+            return
+        if interaction.guild_id:
+            await db.add_member_xp(interaction.guild_id, interaction.user.id, xp_gain)
+        msg = "Completed! +10 XP" if xp_gain == 10 else "Completed (overdue). +5 XP"
         await interaction.edit_original_response(embed=embeds.success(msg))
 
     @app_commands.command(name="todo_stats", description="Show counts by status/category and overdue tasks")
     async def todo_stats(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        todos: List[Dict[str, Any]] = _migrate_todos(user.get("todos", []))
-        if not todos:
+        counts = await db.todo_counts(interaction.user.id, STATUS_CHOICES, CATEGORY_CHOICES, now=_now_ts())
+        if not counts["total"]:
             await interaction.edit_original_response(embed=embeds.warn("No tasks yet."))
             return
-        # Counts
-        by_status = {s: 0 for s in STATUS_CHOICES}
-        by_cat = {c: 0 for c in CATEGORY_CHOICES}
-        overdue = 0
-        now = _now_ts()
-        for t in todos:
-            by_status[t.get("status", "Pending")] = by_status.get(t.get("status", "Pending"), 0) + 1
-            by_cat[t.get("cat", "Personal")] = by_cat.get(t.get("cat", "Personal"), 0) + 1
-            due = t.get("due")
-            if due and int(due) < now and t.get("status") != "Done":
-                overdue += 1
+        by_status, by_cat, overdue = counts["status"], counts["category"], counts["overdue"]
 
         desc_lines = [
             f"Status — Pending: {by_status.get('Pending',0)}, In-Progress: {by_status.get('In-Progress',0)}, Done: {by_status.get('Done',0)}",
@@ -26,20 +26,18 @@ class Voice(commands.Cog):
         if vc is None:
             await interaction.edit_original_response(embed=embeds.warn("Join a voice channel or specify one."))
             return
-        user = await db.get_user(interaction.user.id)
-        user.setdefault("voice", {})
-        user["voice"]["enabled"] = True
-        user["voice"]["voice_channel_id"] = vc.id
-        await db.set_user(interaction.user.id, user)
+        async with db.user_txn(interaction.user.id) as user:
+            user.setdefault("voice", {})
+            user["voice"]["enabled"] = True
+            user["voice"]["voice_channel_id"] = vc.id
         await interaction.edit_original_response(embed=embeds.success(f"Voice reminders enabled in {vc.name}."))
 
     @app_commands.command(name="voice_disable", description="Disable voice reminders")
     async def voice_disable(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        user.setdefault("voice", {})
-        user["voice"]["enabled"] = False
-        await db.set_user(interaction.user.id, user)
+        async with db.user_txn(interaction.user.id) as user:
+            user.setdefault("voice", {})
+            user["voice"]["enabled"] = False
         await interaction.edit_original_response(embed=embeds.success("Voice reminders disabled."))
 
     @app_commands.command(name="voice_set", description="Set a sound file for a reminder key (focus_start, break_start, session_end)")
@@ -51,11 +49,10 @@ class Voice(commands.Cog):
     ])
     async def voice_set(self, interaction: discord.Interaction, key: app_commands.Choice[str], filename: str):
         await interaction.response.defer(ephemeral=True)
-        user = await db.get_user(interaction.user.id)
-        user.setdefault("voice", {})
-        sounds = user["voice"].setdefault("sounds", {})
-        sounds[key.value] = filename
-        await db.set_user(interaction.user.id, user)
+        async with db.user_txn(interaction.user.id) as user:
+            user.setdefault("voice", {})
+            sounds = user["voice"].setdefault("sounds", {})
+            sounds[key.value] = filename
         await interaction.edit_original_response(embed=embeds.success(f"Set {key.value} to {filename}."))
 
     @app_commands.command(name="voice_test", description="Test-play a voice reminder")
@@ -1,5 +1,7 @@
 import json
 import os
+import sys
+import time
 import asyncio
 import logging
 from pathlib import Path
@@ -7,6 +9,9 @@ from pathlib import Path
 import discord
 from discord.ext import commands
 
+from utils import database as db
+from utils.eventbus import for_bot
+
 CONFIG_PATH = Path(__file__).parent / "config.json"
 DATA_DIR = Path(__file__).parent / "data"
 COGS = [
@@ -34,6 +39,8 @@ def load_config():
             "default_pomodoro": {"focus": 25, "short_break": 5, "long_break": 15, "cycles": 4},
             "update_interval_sec": 5,
             "prefix": "/",
+            "storage": {"backend": "json"},
+            "charts": {"workers": 2, "queue": 8, "per_user": 1, "disk_cache": False, "engine": "auto", "prewarm": True},
         }
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -47,6 +54,11 @@ async def setup_bot():
 
     bot = commands.Bot(command_prefix=config.get("prefix", "/"), intents=intents)
     bot.config = config  # type: ignore[attr-defined]
+    # Shared in-process event bus; cogs subscribe to it in cog_load
+    for_bot(bot)
+
+    # Load data (replaying any write-ahead log left by a crash) before cogs touch it
+    await db.start(config.get("storage", {}))
 
     @bot.event
     async def on_ready():
@@ -65,13 +77,21 @@ async def setup_bot():
         except Exception as e:
             logger.exception("Command sync failed: %s", e)
 
-    # Load cogs
+    # Load cogs, timing each so slow imports show up in the startup log
+    import_costs = {}
     for ext in COGS:
+        started = time.perf_counter()
+        modules_before = len(sys.modules)
         try:
             await bot.load_extension(ext)
             logger.info("Loaded extension %s", ext)
         except Exception:
             logger.exception("Failed to load extension %s", ext)
+        import_costs[ext] = (time.perf_counter() - started, len(sys.modules) - modules_before)
+    bot.import_costs = import_costs  # type: ignore[attr-defined]
+    report = ", ".join(f"{ext} {secs * 1000:.0f} ms/{mods} modules"
+                       for ext, (secs, mods) in sorted(import_costs.items(), key=lambda kv: -kv[1][0]))
+    logger.info("Extension load costs: %s", report)
 
     return bot
 
@@ -84,7 +104,12 @@ def main():
 
     async def runner():
         bot = await setup_bot()
-        await bot.start(token)
+        try:
+            await bot.start(token)
+        finally:
+            # Let queued rewards reach the store before it flushes
+            await bot.bus.close()
+            await db.close()
 
     asyncio.run(runner())
 
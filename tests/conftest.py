@@ -0,0 +1,40 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import database as db  # noqa: E402
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """utils.database pointed at an empty data directory under tmp_path."""
+    for name in dir(db):
+        value = getattr(db, name)
+        if name.endswith("_PATH") and isinstance(value, Path) and value.parent == db.DATA_DIR:
+            monkeypatch.setattr(db, name, tmp_path / value.name)
+    collections = {tmp_path / path.name: spec for path, spec in db.COLLECTIONS.items()}
+    monkeypatch.setattr(db, "COLLECTIONS", collections)
+    monkeypatch.setattr(db, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(db, "_stores", db._json_stores(fsync=False))
+    monkeypatch.setattr(db, "_stripes", [asyncio.Lock() for _ in range(db.LOCK_STRIPES)])
+    monkeypatch.setattr(db, "_rank_indexes", {})
+    monkeypatch.setattr(db, "_todo_indexes", {})
+    monkeypatch.setattr(db, "_streak_index", None)
+    monkeypatch.setattr(db, "_focus", None)
+    return tmp_path
+
+
+def run(coro_fn):
+    """Run coro_fn() with the store started, closing it afterwards."""
+    async def main():
+        await db.start({"fsync": False})
+        try:
+            return await coro_fn()
+        finally:
+            await db.close()
+
+    return asyncio.run(main())
@@ -0,0 +1,119 @@
+import asyncio
+import datetime as dt
+import time
+
+from conftest import run
+from cogs.events import Events
+from utils import database as db
+from utils import streaks
+
+
+class _Bot:
+    guilds = []
+
+
+def _cog():
+    # Skip __init__ so the task loops don't start
+    cog = Events.__new__(Events)
+    cog.bot = _Bot()
+    cog._job_locks = {"daily": asyncio.Lock(), "monthly": asyncio.Lock()}
+    cog._resumed = False
+    return cog
+
+
+def test_overlapping_monthly_runs_reset_once(sandbox, monkeypatch):
+    calls = []
+    subtract = db.subtract_monthly_xp
+
+    async def counting_subtract(amounts, guild_id=None, run=None):
+        calls.append(guild_id)
+        return await subtract(amounts, guild_id, run)
+
+    monkeypatch.setattr(db, "subtract_monthly_xp", counting_subtract)
+
+    async def body():
+        async with db.user_txn(1) as u:
+            u["xp"] = u["monthly_xp"] = 10
+        cog = _cog()
+        await asyncio.gather(cog.run_monthly("2026-11", "2026-10"), cog.run_monthly("2026-11", "2026-10"))
+        assert calls == [None]
+        assert (await db.get_hof())["2026-10"][0]["monthly_xp"] == 10
+        assert (await db.get_user(1))["monthly_xp"] == 0
+
+    run(body)
+
+
+def test_monthly_reset_resumed_mid_scope_keeps_later_grants(sandbox, monkeypatch):
+    monkeypatch.setattr(db, "JOB_CHUNK", 2)
+
+    async def body():
+        for uid in range(1, 11):
+            async with db.user_txn(uid) as u:
+                u["xp"] = u["monthly_xp"] = 50
+        job = asyncio.get_running_loop().create_task(_cog().run_monthly("2026-11", "2026-10"))
+        # Let the reset get part-way through the users, then kill it
+        while not (await db.get_user(1)).get("monthly_reset"):
+            await asyncio.sleep(0)
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+        assert (await db.get_user(10))["monthly_xp"] == 50
+        # Rounds credited after the restart, before the job resumes
+        for uid in (1, 10):
+            async with db.user_txn(uid) as u:
+                u["monthly_xp"] += 15
+        await _cog().run_monthly("2026-11", "2026-10")
+        for uid in range(1, 11):
+            assert (await db.get_user(uid))["monthly_xp"] == (15 if uid in (1, 10) else 0), uid
+        state = await db.get_season_state()
+        assert state["jobs"]["monthly"]["done"] and state["jobs"]["monthly"]["amounts"] == {}
+
+    run(body)
+
+
+def test_daily_job_visits_only_streaks_that_may_have_broken(sandbox, monkeypatch):
+    visited = []
+    get_user = db.get_user
+
+    async def spy(uid):
+        visited.append(uid)
+        return await get_user(uid)
+
+    async def body():
+        now = time.time()
+        today = dt.datetime.fromtimestamp(now, dt.timezone.utc).toordinal()
+        records = {
+            1: {"streak": 3, "last_active_day": today - 5},   # broken
+            2: {"streak": 2, "last_active_day": today},       # still running
+            3: {"streak": 0, "last_active_day": today - 9},   # nothing to break
+        }
+        for uid, fields in records.items():
+            async with db.user_txn(uid) as u:
+                u.update(fields, tz="UTC", activity=streaks.empty_activity(fields["last_active_day"]))
+        await db.get_user(4)  # never stored
+        monkeypatch.setattr(db, "get_user", spy)
+        await _cog().run_daily(dt.date.fromordinal(today).isoformat())
+        monkeypatch.setattr(db, "get_user", get_user)
+        assert visited == [1]
+        assert [(await db.get_user(uid))["streak"] for uid in (1, 2, 3)] == [0, 2, 0]
+        assert await db.streak_candidates(today + 10) == [2]
+
+    run(body)
+
+
+def test_on_ready_resumes_jobs_once(sandbox, monkeypatch):
+    resumed = []
+
+    async def body():
+        cog = _cog()
+
+        async def fake_daily(run_id):
+            resumed.append(run_id)
+            await asyncio.sleep(0)
+
+        monkeypatch.setattr(cog, "run_daily", fake_daily)
+        await cog._checkpoint("daily", run="2026-10-17", done=False)
+        await asyncio.gather(cog.on_ready(), cog.on_ready())
+        await cog.on_ready()
+        assert resumed == ["2026-10-17"]
+
+    run(body)
@@ -0,0 +1,13 @@
+import os
+import stat
+
+from utils.fileio import atomic_write_json, backup_path
+
+
+def test_replace_keeps_file_mode(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text("{}")
+    os.chmod(path, 0o644)
+    atomic_write_json(path, {"1": {"xp": 5}}, fsync=False, backups=1)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert backup_path(path, 1).read_text() == "{}"
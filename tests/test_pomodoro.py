@@ -0,0 +1,41 @@
+from cogs.pomodoro import Pomodoro
+
+T0 = 1_790_000_000
+
+
+def _session(**fields):
+    session = {"phase": "focus", "current_cycle": 1, "cycles": 4, "focus": 25, "short_break": 5,
+               "long_break": 15, "ends_at": T0 + 25 * 60}
+    session.update(fields)
+    return session
+
+
+def _step_by_step(cog, session, now):
+    ends = []
+    while session["ends_at"] <= now:
+        if session["phase"] == "focus":
+            ends.append(session["ends_at"])
+        cog._advance_phase_at(session, session["ends_at"])
+    return ends
+
+
+def test_catch_up_matches_stepping_every_phase():
+    cog = Pomodoro.__new__(Pomodoro)
+    for start in (_session(), _session(phase="short_break", current_cycle=2, ends_at=T0 + 300),
+                  _session(cycles=1, long_break=0)):
+        for offline in (0, 60, 25 * 60, 3 * 3600 + 17, 5 * 86400 + 1234):
+            now = T0 + offline
+            fast, slow = dict(start), dict(start)
+            missed = cog._catch_up(fast, now)
+            ends = _step_by_step(cog, slow, now)
+            assert fast == slow, (start, offline)
+            assert missed == ends[-fast["cycles"]:] if ends else missed == []
+            assert fast["ends_at"] > now
+
+
+def test_catch_up_credits_at_most_one_round():
+    cog = Pomodoro.__new__(Pomodoro)
+    session = _session()
+    missed = cog._catch_up(session, T0 + 30 * 86400)
+    assert len(missed) == 4
+    assert missed == sorted(missed) and missed[-1] <= T0 + 30 * 86400
@@ -0,0 +1,77 @@
+import time
+
+from conftest import run
+from cogs import reminders
+from cogs.reminders import Reminders
+from utils import database as db
+
+
+class _User:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    async def send(self, text):
+        if self.error is not None:
+            raise self.error
+        self.sent.append(text)
+
+
+class _Bot:
+    def __init__(self, user):
+        self.user = user
+
+    def get_user(self, uid):
+        return self.user
+
+
+def test_reminders_survive_a_restart(sandbox, monkeypatch):
+    async def first():
+        rid = await db.add_reminder(1, time.time() + 600, "stretch")
+        reminder = await db.get_reminder(rid)
+        reminder["attempts"] = 1
+        await db.set_reminder(rid, reminder)
+        gone = await db.add_reminder(1, time.time() + 60, "cancelled")
+        await db.delete_reminder(gone)
+        return rid
+
+    rid = run(first)
+    monkeypatch.setattr(db, "_stores", db._json_stores(fsync=False))
+
+    async def second():
+        stored = await db.get_reminders()
+        assert list(stored) == [rid]
+        assert (stored[rid]["user_id"], stored[rid]["message"], stored[rid]["attempts"]) == (1, "stretch", 1)
+        cog = Reminders(_Bot(_User()))
+        await cog.cog_load()
+        cog.cog_unload()
+        assert rid in cog.scheduler and cog._pending == {1: 1}
+
+    run(second)
+
+
+def test_failed_delivery_backs_off_then_gives_up(sandbox):
+    async def body():
+        user = _User(error=ConnectionResetError("reset by peer"))
+        cog = Reminders(_Bot(user))
+        rid = await db.add_reminder(2, time.time(), "drink water")
+        cog._schedule(rid, await db.get_reminder(rid))
+        delays = []
+        for _ in range(reminders.MAX_ATTEMPTS - 1):
+            before = time.time()
+            await cog._deliver_one(rid)
+            reminder = await db.get_reminder(rid)
+            delays.append(round(reminder["due"] - before, -1))
+            assert rid in cog.scheduler
+        assert delays == [reminders.RETRY_DELAY_SEC * 2 ** n for n in range(reminders.MAX_ATTEMPTS - 1)]
+        await cog._deliver_one(rid)
+        assert await db.get_reminder(rid) is None
+        assert cog._pending == {}
+
+        user.error = None
+        rid = await db.add_reminder(2, time.time(), "done")
+        cog._schedule(rid, await db.get_reminder(rid))
+        await cog._deliver_one(rid)
+        assert user.sent == ["⏰ Reminder: done"] and await db.get_reminder(rid) is None
+
+    run(body)
@@ -0,0 +1,55 @@
+import asyncio
+
+from conftest import run
+from utils import database as db
+
+
+async def _seed(n):
+    for uid in range(1, n + 1):
+        async with db.user_txn(uid) as u:
+            u["xp"] = 100 + uid
+            u["monthly_xp"] = 90
+
+
+def test_xp_granted_mid_reset_survives(sandbox, monkeypatch):
+    monkeypatch.setattr(db, "JOB_CHUNK", 3)
+
+    async def body():
+        await _seed(20)
+        reset = asyncio.get_running_loop().create_task(db.reset_monthly_xp())
+        # Let the reset take its snapshot and start, then grant while it is part-way
+        await asyncio.sleep(0)
+        async with db.user_txn(19) as u:
+            u["xp"] += 7
+            u["monthly_xp"] += 7
+        await reset
+        user = await db.get_user(19)
+        assert user["monthly_xp"] == 7
+        assert db._rank_index(("monthly_xp", "xp"))._by_user[19] == (7, 126, 19)
+        assert [uid for uid, _ in await db.top_users(("monthly_xp", "xp"), 1)] == [19]
+        assert (await db.get_user(1))["monthly_xp"] == 0
+
+    run(body)
+
+
+def test_reset_with_grants_at_every_yield(sandbox, monkeypatch):
+    monkeypatch.setattr(db, "JOB_CHUNK", 2)
+
+    async def body():
+        await _seed(30)
+        granted = {}
+        reset = asyncio.get_running_loop().create_task(db.reset_monthly_xp())
+        uid = 30
+        while not reset.done():
+            await asyncio.sleep(0)
+            async with db.user_txn(uid) as u:
+                u["monthly_xp"] += 5
+            granted[uid] = granted.get(uid, 0) + 5
+            uid = uid - 1 or 30
+        await reset
+        for uid in range(1, 31):
+            assert (await db.get_user(uid))["monthly_xp"] == granted.get(uid, 0)
+        order = [(u["monthly_xp"], u["xp"]) for _, u in await db.top_users(("monthly_xp", "xp"), 30)]
+        assert order == sorted(order, reverse=True)
+
+    run(body)
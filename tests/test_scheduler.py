@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from utils.scheduler import DeadlineScheduler
+
+
+def _collect():
+    fired = []
+
+    async def handler(keys):
+        fired.append(sorted(keys))
+
+    return fired, DeadlineScheduler(handler)
+
+
+def test_fires_due_keys_in_one_batch_and_skips_cancelled():
+    async def body():
+        fired, sched = _collect()
+        sched.start()
+        now = time.time()
+        sched.schedule("a", now + 0.02)
+        sched.schedule("b", now + 0.02)
+        sched.schedule("c", now + 0.02)
+        sched.cancel("c")
+        await asyncio.sleep(0.1)
+        sched.stop()
+        assert fired == [["a", "b"]]
+        assert len(sched) == 0 and "a" not in sched
+
+    asyncio.run(body())
+
+
+def test_reschedule_moves_the_deadline():
+    async def body():
+        fired, sched = _collect()
+        sched.start()
+        now = time.time()
+        sched.schedule("late", now + 0.02)
+        sched.schedule("late", now + 0.15)
+        sched.schedule("early", now + 0.05)
+        await asyncio.sleep(0.1)
+        assert fired == [["early"]]
+        await asyncio.sleep(0.1)
+        sched.stop()
+        assert fired == [["early"], ["late"]]
+        assert sched.stats()["fired"] == 2
+
+    asyncio.run(body())
+
+
+def test_earlier_deadline_wakes_a_sleeping_scheduler():
+    async def body():
+        fired, sched = _collect()
+        sched.start()
+        sched.schedule("far", time.time() + 60)
+        await asyncio.sleep(0.01)
+        sched.schedule("near", time.time() + 0.02)
+        await asyncio.sleep(0.1)
+        sched.stop()
+        assert fired == [["near"]]
+        assert "far" in sched
+
+    asyncio.run(body())
+
+
+def test_failing_handler_does_not_stop_the_scheduler():
+    calls = []
+
+    async def handler(keys):
+        calls.append(keys)
+        raise RuntimeError("boom")
+
+    async def body():
+        sched = DeadlineScheduler(handler)
+        sched.start()
+        sched.schedule(1, time.time())
+        await asyncio.sleep(0.05)
+        sched.schedule(2, time.time())
+        await asyncio.sleep(0.05)
+        sched.stop()
+
+    asyncio.run(body())
+    assert calls == [[1], [2]]
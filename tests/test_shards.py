@@ -0,0 +1,28 @@
+import threading
+
+from conftest import run
+from utils import database as db
+
+
+def test_guild_shard_opens_on_io_thread(sandbox, monkeypatch):
+    threads = []
+    open_shard = db._open_guild_shard
+
+    def spy(guild_id, name):
+        threads.append(threading.current_thread().name)
+        return open_shard(guild_id, name)
+
+    monkeypatch.setattr(db, "_open_guild_shard", spy)
+
+    async def body():
+        await db.add_member_xp(7, 1, 30)
+        await db.add_member_xp(7, 2, 50)
+        assert [uid for uid, _ in await db.top_users(("xp",), 10, guild_id=7)] == [2, 1]
+        assert await db.user_rank(1, guild_id=7) == 2
+        async with db.challenge_txn(7) as ch:
+            ch["goal"] = 5
+        assert (await db.get_challenge(7))["goal"] == 5
+        assert await db.guild_ids() == [7]
+
+    run(body)
+    assert threads == ["db-io_0", "db-io_0"]
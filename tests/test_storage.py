@@ -0,0 +1,105 @@
+from utils.storage import LogStore, SqliteStore, open_sqlite
+
+
+def _flush(store):
+    store.write(store.take_dirty())
+
+
+def test_log_replays_over_snapshot(tmp_path):
+    path = tmp_path / "users.json"
+    store = LogStore(path, {}, fsync=False)
+    store.set("1", {"xp": 10})
+    store.set("2", {"xp": 20})
+    _flush(store)
+    store.set("1", {"xp": 15})
+    store.delete("2")
+    _flush(store)
+    assert not path.exists()
+    reopened = LogStore(path, {}, fsync=False)
+    assert reopened.load() == {"1": {"xp": 15}}
+    assert reopened.log_records == 4
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path = tmp_path / "users.json"
+    store = LogStore(path, {}, fsync=False)
+    store.set("1", {"xp": 10})
+    _flush(store)
+    with open(store.log_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"set","k":"2","v":{"xp"')
+    assert LogStore(path, {}, fsync=False).load() == {"1": {"xp": 10}}
+
+
+def test_compaction_folds_log_into_snapshot(tmp_path):
+    path = tmp_path / "users.json"
+    store = LogStore(path, {}, compact_every=2, fsync=False, backups=1)
+    store.set("1", {"xp": 10})
+    store.set("2", {"xp": 20})
+    _flush(store)
+    assert store.needs_compaction
+    store.compact(dict(store.data))
+    assert store.log_records == 0 and store.log_path.read_text() == ""
+    # Records written after the compaction replay on top of the new snapshot
+    store.set("2", {"xp": 25})
+    _flush(store)
+    reopened = LogStore(path, {}, fsync=False, backups=1)
+    assert reopened.load() == {"1": {"xp": 10}, "2": {"xp": 25}}
+    assert reopened.log_records == 1
+
+
+def test_snapshot_replaced_before_log_is_truncated(tmp_path):
+    # A crash between the snapshot rename and the log truncation replays
+    # records the snapshot already holds, which is harmless
+    path = tmp_path / "users.json"
+    store = LogStore(path, {}, fsync=False)
+    store.set("1", {"xp": 10})
+    _flush(store)
+    log = store.log_path.read_text()
+    store.compact(dict(store.data))
+    store.log_path.write_text(log)
+    assert LogStore(path, {}, fsync=False).load() == {"1": {"xp": 10}}
+
+
+def test_dirty_keys_coalesce_into_one_record_each(tmp_path):
+    store = LogStore(tmp_path / "users.json", {}, fsync=False)
+    for xp in range(5):
+        store.set("1", {"xp": xp})
+    store.set("2", {"xp": 1})
+    store.delete("2")
+    recs = sorted(store.take_dirty(), key=lambda r: r["k"])
+    assert recs == [{"op": "set", "k": "1", "v": {"xp": 4}}, {"op": "del", "k": "2"}]
+    assert store.take_dirty() == []
+
+
+def test_values_are_copied_in_and_out(tmp_path):
+    store = LogStore(tmp_path / "users.json", {}, fsync=False)
+    user = {"xp": 1, "achievements": []}
+    store.set("1", user)
+    user["achievements"].append("first")
+    store.get("1")["achievements"].append("second")
+    assert store.get("1") == {"xp": 1, "achievements": []}
+
+
+def test_sqlite_store_round_trip_and_indexed_top(tmp_path):
+    conn = open_sqlite(tmp_path / "aurora.db", fsync=False)
+    store = SqliteStore(conn, "users", {})
+    for uid, xp, monthly in (("1", 10, 5), ("2", 30, 0), ("3", 20, 5)):
+        store.set(uid, {"xp": xp, "monthly_xp": monthly})
+    store.delete("2")
+    store.set("4", {"xp": 30})
+    store.write(store.take_dirty())
+    reopened = SqliteStore(conn, "users", {})
+    assert reopened.load()["1"] == {"xp": 10, "monthly_xp": 5}
+    assert [k for k, _ in reopened.top(("xp",), 2)] == ["4", "3"]
+    assert [k for k, _ in reopened.top(("monthly_xp", "xp"), 2)] == ["3", "1"]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_users_xp", "idx_users_monthly_xp_xp"} <= indexes
+
+
+def test_sqlite_store_drops_retired_index(tmp_path):
+    conn = open_sqlite(tmp_path / "aurora.db", fsync=False)
+    conn.execute("CREATE TABLE users (k TEXT PRIMARY KEY, v TEXT NOT NULL, xp INTEGER, monthly_xp INTEGER)")
+    conn.execute("CREATE INDEX idx_users_last_focus_ts ON users (xp)")
+    SqliteStore(conn, "users", {})
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_users_last_focus_ts" not in indexes
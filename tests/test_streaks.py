@@ -0,0 +1,33 @@
+from conftest import run
+from utils import database as db
+from utils import gamify, streaks
+
+DAY = 86400
+# Noon UTC, well away from any date boundary
+NOON = 1_790_000_000 - 1_790_000_000 % DAY + 12 * 3600
+
+
+def test_first_completion_after_deploy_keeps_history_streak(sandbox):
+    async def body():
+        async with db.user_txn(1) as u:
+            u["tz"] = "UTC"
+            u["streak"] = 40  # placeholder value from the old daily job
+        for d in (3, 2, 1):
+            await db.append_focus(1, NOON - d * DAY)
+        await gamify.apply_focus_completion(None, 1, when_ts=NOON)
+        user = await db.get_user(1)
+        assert user["streak"] == 4
+        assert user["longest_streak"] == 4
+        assert streaks.is_active(user, user["last_active_day"] - 3)
+
+    run(body)
+
+
+def test_late_completion_joins_runs():
+    user = {}
+    clock = streaks.tz.clock("UTC")
+    for d in (0, 1, 3, 4):
+        streaks.record(user, NOON + d * DAY, clock)
+    assert (user["streak"], user["longest_streak"]) == (2, 2)
+    streaks.record(user, NOON + 2 * DAY, clock)
+    assert (user["streak"], user["longest_streak"]) == (5, 5)
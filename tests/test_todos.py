@@ -0,0 +1,68 @@
+import asyncio
+
+from conftest import run
+from utils import database as db
+
+STATUSES = ["Pending", "In-Progress", "Done"]
+CATEGORIES = ["Study", "Work", "Personal"]
+
+
+def _todo(**fields):
+    todo = {"title": "t", "cat": "Work", "status": "Pending", "priority": "normal", "created": 0, "due": None}
+    todo.update(fields)
+    return todo
+
+
+def test_add_todo_on_cold_index_counts_once(sandbox):
+    async def body():
+        todo_id = await db.add_todo(1, _todo(due=1))
+        counts = await db.todo_counts(1, STATUSES, CATEGORIES, now=100)
+        assert counts["overdue"] == 1
+        assert counts["status"]["Pending"] == 1
+        await db.update_todo(1, todo_id, {"status": "Done"})
+        counts = await db.todo_counts(1, STATUSES, CATEGORIES, now=100)
+        assert counts["overdue"] == 0
+        assert db._todo_index(1).open_due == []
+
+    run(body)
+
+
+def test_update_todo_on_cold_index_counts_once(sandbox):
+    async def body():
+        todo_id = await db.add_todo(2, _todo(due=1))
+        db._todo_indexes.clear()
+        await db.update_todo(2, todo_id, {"cat": "Study", "due": 5})
+        assert db._todo_index(2).open_due == [(5, todo_id)]
+        assert [i for i, _ in await db.get_todos(2, category="Study")] == [todo_id]
+        assert await db.get_todos(2, category="Work") == []
+
+    run(body)
+
+
+def test_ids_are_stable(sandbox):
+    async def body():
+        first = await db.add_todo(3, _todo(title="a"))
+        second = await db.add_todo(3, _todo(title="b"))
+        await db.update_todo(3, first, {"status": "Done"})
+        assert [(i, t["title"]) for i, t in await db.get_todos(3, status="Pending")] == [(second, "b")]
+        assert await db.update_todo(3, 99, {"status": "Done"}) is None
+
+    run(body)
+
+
+def test_complete_todo_rewards_once(sandbox):
+    async def body():
+        todo_id = await db.add_todo(4, _todo())
+
+        def credit(user, item):
+            user["xp"] += 10
+            return 10
+
+        first, second = await asyncio.gather(db.complete_todo(4, todo_id, credit),
+                                             db.complete_todo(4, todo_id, credit))
+        assert sorted([first[1], second[1]]) == [0, 10]
+        assert (await db.get_user(4))["xp"] == 10
+        assert (await db.get_todos(4, status="Done"))[0][0] == todo_id
+        assert await db.complete_todo(4, 99, credit) == (None, 0)
+
+    run(body)
@@ -0,0 +1,48 @@
+import datetime as dt
+import random
+
+import pytest
+
+from utils import tz
+
+ZONES = ["Europe/Berlin", "America/New_York", "Australia/Lord_Howe", "Asia/Kolkata", "UTC"]
+
+
+def _expected(zone, ts):
+    local = dt.datetime.fromtimestamp(ts, zone)
+    return local.hour, local.date().toordinal()
+
+
+@pytest.mark.parametrize("name", ZONES)
+def test_clock_matches_zoneinfo_around_every_transition(name):
+    zone = tz.ZoneInfo(name)
+    clock = tz.clock(name)
+    assert clock.name == name
+    samples = [t + d for t in clock._starts for d in (-3601, -1, 0, 1, 3601)]
+    rng = random.Random(name)
+    samples += [rng.randrange(tz.SPAN_START - 86400 * 400, tz.SPAN_END + 86400 * 400) for _ in range(500)]
+    for ts in samples:
+        assert clock.hour_day(ts) == _expected(zone, ts), ts
+        assert clock.offset(ts) == int(dt.datetime.fromtimestamp(ts, zone).utcoffset().total_seconds()), ts
+
+
+def test_dst_zone_has_two_transitions_a_year():
+    clock = tz.clock("Europe/Berlin")
+    assert len(clock._starts) == 1 + 2 * 25
+    # 2026-03-29 01:00 UTC: clocks go from 02:00 to 03:00 local time
+    spring = int(dt.datetime(2026, 3, 29, 1, tzinfo=dt.timezone.utc).timestamp())
+    assert spring in clock._starts
+    assert (clock.hour(spring - 1), clock.hour(spring)) == (1, 3)
+
+
+def test_hours_days_matches_hour_day():
+    clock = tz.clock("America/New_York")
+    rng = random.Random(7)
+    ts = sorted(rng.randrange(tz.SPAN_START - 86400 * 30, tz.SPAN_END + 86400 * 30) for _ in range(2000))
+    assert clock.hours_days(ts) == [clock.hour_day(t) for t in ts]
+    assert clock.hours_days(list(reversed(ts))) == [clock.hour_day(t) for t in reversed(ts)]
+
+
+def test_unknown_zone_falls_back_to_host_time():
+    assert tz.clock("Not/AZone").name == ""
+    assert not tz.is_valid("Not/AZone") and tz.is_valid("Europe/Berlin")
@@ -0,0 +1,84 @@
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from .scheduler import DeadlineScheduler
+
+# How long the owner has to react to an end-of-session prompt
+CONFIRM_TIMEOUT_SEC = 30
+# Reactions are collected for this long and their strike resets applied together
+BATCH_DELAY_SEC = 1.0
+CONFIRM_EMOJI = "✅"
+# Missed prompts in a row before the owner is disconnected from voice
+AFK_STRIKE_LIMIT = 3
+
+_FLUSH = ("afk-flush",)
+
+
+class AfkPrompt(NamedTuple):
+    message_id: int
+    user_id: int
+    guild_id: Optional[int]
+
+
+class AfkTracker:
+    """Pending end-of-session ✅ prompts, indexed by message id.
+
+    A reaction is matched with one dict lookup (see resolve(), fed from
+    on_raw_reaction_add); expiry uses one DeadlineScheduler for every prompt.
+    Outcomes are buffered and handed to handler([(prompt, reacted), ...]) in
+    batches: all prompts expiring on the same wake-up together, and
+    confirmations at most BATCH_DELAY_SEC after the reaction.
+    """
+
+    def __init__(self, handler: Callable[[List[Tuple[AfkPrompt, bool]]], Awaitable[None]],
+                 timeout: float = CONFIRM_TIMEOUT_SEC):
+        self._handler = handler
+        self.timeout = timeout
+        self._pending: Dict[int, AfkPrompt] = {}
+        self._results: List[Tuple[AfkPrompt, bool]] = []
+        self.scheduler = DeadlineScheduler(self._on_due)
+        # Counters
+        self.confirmed = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._pending
+
+    def start(self) -> None:
+        self.scheduler.start()
+
+    def stop(self) -> None:
+        self.scheduler.stop()
+
+    def add(self, message_id: int, user_id: int, guild_id: Optional[int] = None) -> None:
+        self._pending[message_id] = AfkPrompt(message_id, int(user_id), guild_id)
+        self.scheduler.schedule(message_id, time.time() + self.timeout)
+
+    def resolve(self, message_id: int, user_id: int, emoji: str) -> bool:
+        """Record a reaction. True when it confirmed a pending prompt."""
+        prompt = self._pending.get(message_id)
+        if prompt is None or prompt.user_id != user_id or emoji != CONFIRM_EMOJI:
+            return False
+        del self._pending[message_id]
+        self.scheduler.cancel(message_id)
+        self.confirmed += 1
+        self._results.append((prompt, True))
+        if _FLUSH not in self.scheduler:
+            self.scheduler.schedule(_FLUSH, time.time() + BATCH_DELAY_SEC)
+        return True
+
+    async def _on_due(self, keys: List[Hashable]) -> None:
+        for key in keys:
+            prompt = self._pending.pop(key, None) if key != _FLUSH else None
+            if prompt is not None:
+                self.expired += 1
+                self._results.append((prompt, False))
+        if self._results:
+            results, self._results = self._results, []
+            await self._handler(results)
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._pending), "confirmed": self.confirmed, "expired": self.expired}
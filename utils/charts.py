@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .pngbars import render_bar_png
+
+# Defaults for the "charts" section of config.json
+CHART_WORKERS = 2
+CHART_QUEUE = 8
+CHART_PER_USER = 1
+CACHE_BYTES = 8 * 1024 * 1024
+DISK_CACHE_FILES = 2000
+DISK_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "chart_cache"
+
+BAR_COLOR = "#7C3AED"
+# Bar colour per user theme (see /theme_set)
+THEME_COLORS = {"aurora": BAR_COLOR, "midnight": "#1E40AF", "solar": "#F59E0B"}
+
+
+def matplotlib_available() -> bool:
+    return importlib.util.find_spec("matplotlib") is not None
+
+
+# Worker side: each process configures matplotlib once and keeps one figure
+# around, clearing its axes between charts instead of building a new figure.
+# With engine "builtin" (or no matplotlib) charts come from utils.pngbars.
+_fig = None
+_ax = None
+_engine = "matplotlib"
+
+
+def _init_worker(engine: str = "matplotlib") -> None:
+    global _fig, _ax, _engine
+    _engine = engine
+    if engine != "matplotlib":
+        return
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        _engine = "builtin"
+        return
+    _fig, _ax = plt.subplots(figsize=(7, 3))
+
+
+def _warm() -> str:
+    """Render a throwaway chart so fonts and the Agg backend are loaded before real requests."""
+    _render_bar(["0"], [1], "warm-up")
+    return _engine
+
+
+def _render_bar(labels: List[str], values: List[int], title: str, color: str = BAR_COLOR) -> bytes:
+    if _engine != "matplotlib":
+        return render_bar_png(labels, values, title, color)
+    if _fig is None:
+        _init_worker()
+        if _fig is None:
+            return render_bar_png(labels, values, title, color)
+    _ax.clear()
+    _ax.bar(labels, values, color=color)
+    _ax.set_title(title)
+    _ax.set_ylabel("Count")
+    _ax.set_xlabel("")
+    _fig.tight_layout()
+    buf = io.BytesIO()
+    _fig.savefig(buf, format="png", dpi=160)
+    return buf.getvalue()
+
+
+def chart_key(kind: str, labels: List[str], values: List[int], title: str, theme: str) -> str:
+    """Content address of a chart: identical inputs always render identical PNGs."""
+    raw = json.dumps([kind, list(labels), list(values), title, theme], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    """PNG bytes by chart_key(): an LRU bounded by total size, plus an optional disk tier.
+
+    Keys hash the chart's bins, so a new focus completion simply produces a new
+    key; stale entries age out of the LRU (and the disk tier keeps only the
+    newest `disk_files` files). Disk reads and writes are blocking; the
+    renderer runs them off the event loop.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES, disk_dir: Optional[Path] = None,
+                 disk_files: int = DISK_CACHE_FILES):
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk_dir = disk_dir
+        self.disk_files = disk_files
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._disk_writes = 0
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        png = self._items.get(key)
+        if png is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+        return png
+
+    def put(self, key: str, png: bytes) -> None:
+        if len(png) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[key] = png
+        self._bytes += len(png)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.png"
+
+    def read_disk(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        try:
+            png = self._disk_path(key).read_bytes()
+        except OSError:
+            return None
+        try:
+            # Touch so pruning keeps recently used charts
+            os.utime(self._disk_path(key))
+        except OSError:
+            pass
+        return png
+
+    def write_disk(self, key: str, png: bytes) -> None:
+        if self.disk_dir is None:
+            return
+        try:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".chart.", suffix=".tmp", dir=str(self.disk_dir))
+            with os.fdopen(fd, "wb") as f:
+                f.write(png)
+            os.replace(tmp, self._disk_path(key))
+        except OSError:
+            return
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self.prune_disk()
+
+    def prune_disk(self) -> None:
+        try:
+            files = sorted(self.disk_dir.glob("*.png"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[:max(0, len(files) - self.disk_files)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "items": len(self._items),
+            "bytes": self._bytes,
+        }
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ChartBusy(Exception):
+    """Raised when the render queue is full or the user already has a chart in flight."""
+
+
+class ChartRenderer:
+    """Renders charts in a small process pool so the event loop never blocks on matplotlib.
+
+    At most `workers + queue` jobs are accepted at once and each user may have
+    `per_user` of them; anything beyond that raises ChartBusy straight away
+    rather than piling up behind slow renders. The pool starts on first use.
+    """
+
+    def __init__(self, workers: int = CHART_WORKERS, queue: int = CHART_QUEUE, per_user: int = CHART_PER_USER,
+                 cache: Optional[ChartCache] = None, engine: str = "auto"):
+        if engine not in ("matplotlib", "builtin"):
+            engine = "matplotlib" if matplotlib_available() else "builtin"
+        self.engine = engine
+        self.cache = cache or ChartCache()
+        self.workers = max(1, int(workers))
+        self.capacity = self.workers + max(0, int(queue))
+        self.per_user = max(1, int(per_user))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._by_user: Dict[int, int] = {}
+        # Counters
+        self.rendered = 0
+        self.rejected = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ChartRenderer":
+        cfg = config.get("charts", {}) if config else {}
+        cache = ChartCache(
+            max_bytes=cfg.get("cache_bytes", CACHE_BYTES),
+            disk_dir=DISK_CACHE_DIR if cfg.get("disk_cache", False) else None,
+        )
+        return cls(
+            workers=cfg.get("workers", CHART_WORKERS),
+            queue=cfg.get("queue", CHART_QUEUE),
+            per_user=cfg.get("per_user", CHART_PER_USER),
+            cache=cache,
+            engine=cfg.get("engine", "auto"),
+        )
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # forkserver: forking the running bot (event loop plus the storage I/O
+            # thread) could hand workers locks held by threads that don't exist there
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context(),
+                                             initializer=_init_worker, initargs=(self.engine,))
+        return self._pool
+
+    async def submit(self, user_id: int, fn: Callable[..., bytes], *args: Any) -> bytes:
+        """Run fn(*args) in the pool on behalf of user_id. fn must be a module-level function."""
+        if self._in_flight >= self.capacity or self._by_user.get(user_id, 0) >= self.per_user:
+            self.rejected += 1
+            raise ChartBusy()
+        self._in_flight += 1
+        self._by_user[user_id] = self._by_user.get(user_id, 0) + 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor(), fn, *args)
+            self.rendered += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next job
+            self.failed += 1
+            self._pool = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            left = self._by_user.get(user_id, 1) - 1
+            if left > 0:
+                self._by_user[user_id] = left
+            else:
+                self._by_user.pop(user_id, None)
+
+    async def bar(self, user_id: int, labels: List[str], values: List[int], title: str, theme: str = "aurora") -> bytes:
+        """PNG bar chart; served from the cache when the same chart was rendered before."""
+        key = chart_key(f"bar:{self.engine}", labels, values, title, theme)
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        loop = asyncio.get_running_loop()
+        if self.cache.disk_dir is not None:
+            png = await loop.run_in_executor(None, self.cache.read_disk, key)
+            if png is not None:
+                self.cache.disk_hits += 1
+                self.cache.put(key, png)
+                return png
+        self.cache.misses += 1
+        color = THEME_COLORS.get(theme, BAR_COLOR)
+        png = await self.submit(user_id, _render_bar, list(labels), list(values), title, color)
+        self.cache.put(key, png)
+        if self.cache.disk_dir is not None:
+            loop.run_in_executor(None, self.cache.write_disk, key, png)
+        return png
+
+    async def prewarm(self) -> str:
+        """Start the pool and load the chart engine in every worker. Returns the engine in use."""
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        engines = await asyncio.gather(*(loop.run_in_executor(pool, _warm) for _ in range(self.workers)))
+        return engines[0]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.cache.stats(),
+            "in_flight": self._in_flight,
+            "capacity": self.capacity,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
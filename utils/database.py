@@ -1,7 +1,17 @@
-import json
+import time
 import asyncio
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import focusstats, tz
+from .fileio import atomic_write_json, backup_path
+from .focuslog import FocusLog
+from .leaderboard import RankIndex
+from .storage import LogStore, SqliteStore, Store, open_sqlite
+from .todos import DONE, TodoIndex, legacy_items
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 USERS_PATH = DATA_DIR / "users.json"
@@ -11,54 +21,364 @@ PARTNERS_PATH = DATA_DIR / "partners.json"
 SHOP_PATH = DATA_DIR / "shop.json"
 HOF_PATH = DATA_DIR / "hall_of_fame.json"
 SEASON_STATE_PATH = DATA_DIR / "season.json"
-
-_lock = asyncio.Lock()
+GUILDS_PATH = DATA_DIR / "guilds.json"
+REMINDERS_PATH = DATA_DIR / "reminders.json"
+TODOS_PATH = DATA_DIR / "todos.json"
+
+SQLITE_PATH = DATA_DIR / "aurora.db"
+
+# Dirty records are flushed at most FLUSH_INTERVAL_SEC after they change, or
+# sooner once FLUSH_THRESHOLD records are pending.
+FLUSH_INTERVAL_SEC = 2
+FLUSH_THRESHOLD = 200
+# How often the background compactor folds logs into snapshots
+COMPACT_INTERVAL_SEC = 60
+# Records handled between yields to the event loop in whole-collection jobs
+JOB_CHUNK = 200
+
+# (sqlite table, default document) per collection
+COLLECTIONS: Dict[Path, Tuple[str, Dict[str, Any]]] = {
+    USERS_PATH: ("users", {}),
+    SESSIONS_PATH: ("sessions", {}),
+    CHALLENGES_PATH: ("challenges", {"goal": 0, "progress": 0}),
+    PARTNERS_PATH: ("partners", {}),
+    SHOP_PATH: ("shop", {"color_roles": [], "specials": []}),
+    HOF_PATH: ("hall_of_fame", {}),
+    SEASON_STATE_PATH: ("season", {"last_rollover": ""}),
+    GUILDS_PATH: ("guilds", {}),
+    REMINDERS_PATH: ("reminders", {}),
+    TODOS_PATH: ("todos", {}),
+}
+
+# Per-guild shards, opened lazily on first use so idle guilds cost nothing:
+# data/guilds/<guild_id>/<name>.json, or table guild_<guild_id>_<name> in sqlite.
+# guilds.json registers every guild that has shards.
+GUILD_COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "members": {},  # user id -> {"xp", "monthly_xp"} earned in this guild
+    "challenges": {"goal": 0, "progress": 0},
+    "hall_of_fame": {},
+}
+
+# Striped locks: a (collection, key) pair always maps to the same lock, so
+# read-modify-write of one record is serialized while unrelated records
+# proceed in parallel. Reads are served from memory and never take a lock.
+LOCK_STRIPES = 64
+# Lock key used for collections that are read and written as one document
+DOC_KEY = ""
+
+_stripes = [asyncio.Lock() for _ in range(LOCK_STRIPES)]
+# All blocking storage I/O runs here; a single worker keeps writes ordered.
+_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-io")
+_flusher: Optional[asyncio.Task] = None
+_flush_wakeup: Optional[asyncio.Event] = None
+_compactor: Optional[asyncio.Task] = None
+_compact_wakeup: Optional[asyncio.Event] = None
+# Open sqlite connection when that backend is active (guild shards share it)
+_sqlite_conn = None
+_fsync = True
+_backups = 3
+# Binary per-user focus history under data/focus/
+_focus: Optional[FocusLog] = None
+
+
+def _json_stores(fsync: bool = True, backups: int = 3) -> Dict[Path, Store]:
+    stores: Dict[Path, Store] = {}
+    for path, (_, default) in COLLECTIONS.items():
+        compact_every = 500 if path in (USERS_PATH, SESSIONS_PATH, PARTNERS_PATH, REMINDERS_PATH, TODOS_PATH) else 100
+        stores[path] = LogStore(path, default, compact_every=compact_every, fsync=fsync, backups=backups)
+    return stores
+
+
+def _sqlite_stores(db_path: Path, fsync: bool = True) -> Dict[Path, Store]:
+    conn = open_sqlite(db_path, fsync=fsync)
+    return {path: SqliteStore(conn, table, default) for path, (table, default) in COLLECTIONS.items()}
+
+
+_stores: Dict[Path, Store] = _json_stores()
+
+# Leaderboard orders kept incrementally sorted; built from the users
+# collection on first use and updated on every user write.
+RANKED_ORDERS: Tuple[Tuple[str, ...], ...] = (("xp",), ("monthly_xp", "xp"))
+_rank_indexes: Dict[Tuple[Path, Tuple[str, ...]], RankIndex] = {}
+# To-do indexes per user id, built on first access and updated on every write
+_todo_indexes: Dict[int, TodoIndex] = {}
+# Users with a running streak (id -> last_active_day), so the nightly streak
+# check never scans the whole collection; built on first use, updated on every user write
+_streak_index: Optional[Dict[int, int]] = None
+
+
+def _ensure_file(path: Path, store: Store) -> None:
+    if isinstance(store, LogStore) and not path.exists() and not backup_path(path, 1).exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(path, store.default, fsync=store.fsync)
 
 
 def _ensure_files():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not USERS_PATH.exists():
-        USERS_PATH.write_text("{}", encoding="utf-8")
-    if not SESSIONS_PATH.exists():
-        SESSIONS_PATH.write_text("{}", encoding="utf-8")
-    if not CHALLENGES_PATH.exists():
-        CHALLENGES_PATH.write_text(json.dumps({"goal": 0, "progress": 0}, ensure_ascii=False, indent=2), encoding="utf-8")
-    if not PARTNERS_PATH.exists():
-        PARTNERS_PATH.write_text("{}", encoding="utf-8")
-    if not SHOP_PATH.exists():
-        SHOP_PATH.write_text(json.dumps({"color_roles": [], "specials": []}, ensure_ascii=False, indent=2), encoding="utf-8")
-    if not HOF_PATH.exists():
-        HOF_PATH.write_text(json.dumps({}, ensure_ascii=False, indent=2), encoding="utf-8")
-    if not SEASON_STATE_PATH.exists():
-        SEASON_STATE_PATH.write_text(json.dumps({"last_rollover": ""}, ensure_ascii=False, indent=2), encoding="utf-8")
+    for path, store in _stores.items():
+        _ensure_file(path, store)
+
+
+def _guild_path(guild_id: int, name: str) -> Path:
+    return DATA_DIR / "guilds" / str(int(guild_id)) / f"{name}.json"
+
+
+def _open_guild_shard(guild_id: int, name: str) -> Store:
+    # Blocking (creates the table or file, then reads it); runs on the I/O thread
+    path = _guild_path(guild_id, name)
+    default = GUILD_COLLECTIONS[name]
+    if _sqlite_conn is not None:
+        store: Store = SqliteStore(_sqlite_conn, f"guild_{int(guild_id)}_{name}", default)
+    else:
+        store = LogStore(path, default, compact_every=500 if name == "members" else 100,
+                         fsync=_fsync, backups=_backups)
+        _ensure_file(path, store)
+    store.load()
+    return store
+
+
+async def _guild_store(guild_id: int, name: str) -> Path:
+    """Path key of a guild shard, opening (and registering) the shard on first use."""
+    path = _guild_path(guild_id, name)
+    if path not in _stores:
+        store = await _run_io(_open_guild_shard, guild_id, name)
+        # Another caller may have opened the shard while this one waited
+        if path not in _stores:
+            _stores[path] = store
+            registry = await _loaded(GUILDS_PATH)
+            if registry.get(str(int(guild_id))) is None:
+                registry.set(str(int(guild_id)), {"migrated": 0})
+                _after_write(registry)
+    return path
+
+
+def _load_store(path: Path) -> None:
+    # Blocking; runs on the I/O thread
+    store = _stores[path]
+    if not store.loaded:
+        _ensure_file(path, store)
+        store.load()
+
+
+async def _loaded(path: Path) -> Store:
+    """The store for path, read from disk on the I/O thread the first time."""
+    store = _stores[path]
+    if not store.loaded:
+        await _run_io(_load_store, path)
+    return store
+
+
+def _store(path: Path) -> Store:
+    # Synchronous access for helpers whose callers already awaited _loaded(path)
+    return _stores[path]
+
+
+async def _run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_io, fn, *args)
+
+
+def _after_write(store: Store) -> None:
+    if store.dirty_count >= FLUSH_THRESHOLD and _flush_wakeup is not None:
+        _flush_wakeup.set()
+
+
+def _key_lock(path: Path, key: str) -> asyncio.Lock:
+    return _stripes[hash((str(path), key)) % LOCK_STRIPES]
+
+
+def _locked(path: Path, *keys: str):
+    return _locked_pairs(*((path, k) for k in keys))
+
+
+@asynccontextmanager
+async def _locked_pairs(*pairs: Tuple[Path, str]):
+    # Acquire in a fixed order so multi-key holders cannot deadlock each other;
+    # pairs that share a stripe share its (non-reentrant) lock
+    locks = {id(lock): lock for lock in (_key_lock(path, k) for path, k in pairs)}
+    held = [locks[i] for i in sorted(locks)]
+    for lock in held:
+        await lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(held):
+            lock.release()
 
 
 async def _read(path: Path) -> Dict[str, Any]:
-    _ensure_files()
-    async with _lock:
-        try:
-            return json.loads(path.read_text(encoding="utf-8") or "{}")
-        except json.JSONDecodeError:
-            return {}
+    return (await _loaded(path)).document()
 
 
 async def _write(path: Path, data: Dict[str, Any]) -> None:
-    _ensure_files()
-    async with _lock:
-        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    async with _key_lock(path, DOC_KEY):
+        store = await _loaded(path)
+        store.replace(data)
+    _after_write(store)
+
+
+async def _read_key(path: Path, key: str, default: Any = None) -> Any:
+    return (await _loaded(path)).get(key, default)
+
+
+async def _write_key(path: Path, key: str, value: Any) -> None:
+    async with _key_lock(path, key):
+        store = await _loaded(path)
+        store.set(key, value)
+    _after_write(store)
+
+
+async def _delete_key(path: Path, key: str) -> None:
+    async with _key_lock(path, key):
+        store = await _loaded(path)
+        store.delete(key)
+    _after_write(store)
+
+
+@asynccontextmanager
+async def _doc_txn(path: Path):
+    async with _key_lock(path, DOC_KEY):
+        store = await _loaded(path)
+        doc = store.document()
+        yield doc
+        store.replace(doc)
+    _after_write(store)
+
+
+async def flush() -> None:
+    loop = asyncio.get_running_loop()
+    # No await between taking and submitting, so writes reach the I/O thread in order
+    pending = [
+        loop.run_in_executor(_io, store.write, recs)
+        for store in _stores.values()
+        if (recs := store.take_dirty())
+    ]
+    await asyncio.gather(*pending)
+    if _compact_wakeup is not None and any(s.needs_compaction for s in _stores.values()):
+        _compact_wakeup.set()
+
+
+async def compact() -> None:
+    await flush()
+    loop = asyncio.get_running_loop()
+    pending = [
+        loop.run_in_executor(_io, store.compact, dict(store.data))
+        for store in _stores.values()
+        if store.loaded
+    ]
+    await asyncio.gather(*pending)
+
+
+async def _flush_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_flush_wakeup.wait(), timeout=FLUSH_INTERVAL_SEC)
+        except asyncio.TimeoutError:
+            pass
+        _flush_wakeup.clear()
+        await flush()
+
+
+async def _compact_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_compact_wakeup.wait(), timeout=COMPACT_INTERVAL_SEC)
+        except asyncio.TimeoutError:
+            pass
+        _compact_wakeup.clear()
+        await compact()
+
+
+def migrate_json_to_sqlite(db_path: Path = SQLITE_PATH, force: bool = False) -> int:
+    """Copy data/*.json (plus any pending log records) into the sqlite database.
+
+    Runs once per database: a marker row in the meta table stops later calls
+    unless force is set. Returns the number of collections copied. Blocking;
+    run it before the bot starts or on the I/O thread.
+    """
+    json_stores = _json_stores()
+    sqlite_stores = _sqlite_stores(db_path)
+    conn = next(iter(sqlite_stores.values())).conn
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+    if not force and conn.execute("SELECT 1 FROM meta WHERE k = 'migrated_from_json'").fetchone():
+        return 0
+    copied = 0
+    for path, target in sqlite_stores.items():
+        source = json_stores[path]
+        if not path.exists() and not source.log_path.exists():
+            continue
+        target.write([{"op": "put", "v": source.load()}])
+        copied += 1
+    for shard in sorted((DATA_DIR / "guilds").glob("*/*.json")):
+        name = shard.stem
+        if name not in GUILD_COLLECTIONS or not shard.parent.name.isdigit():
+            continue
+        source = LogStore(shard, GUILD_COLLECTIONS[name])
+        target = SqliteStore(conn, f"guild_{shard.parent.name}_{name}", GUILD_COLLECTIONS[name])
+        target.write([{"op": "put", "v": source.load()}])
+        copied += 1
+    conn.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('migrated_from_json', ?)", (str(int(time.time())),))
+    return copied
+
+
+async def start(config: Optional[Dict[str, Any]] = None) -> None:
+    """Open the configured backend, load every collection and start the flusher and compactor.
+
+    config is the "storage" section of config.json: {"backend": "json" | "sqlite",
+    "sqlite_path": "data/aurora.db", "fsync": true, "backups": 3}. The JSON
+    backend replays logs left by a crash; a fresh sqlite database is seeded
+    from the JSON files once.
+    """
+    global _stores, _flusher, _flush_wakeup, _compactor, _compact_wakeup, _sqlite_conn, _fsync, _backups, _focus, _streak_index
+    cfg = config or {}
+    fsync = bool(cfg.get("fsync", True))
+    _fsync, _backups = fsync, int(cfg.get("backups", 3))
+    if cfg.get("backend", "json") == "sqlite":
+        db_path = Path(cfg.get("sqlite_path") or SQLITE_PATH)
+        await _run_io(migrate_json_to_sqlite, db_path)
+        _stores = await _run_io(_sqlite_stores, db_path, fsync)
+        _sqlite_conn = next(iter(_stores.values())).conn
+    elif not any(store.loaded for store in _stores.values()):
+        _stores = _json_stores(fsync=fsync, backups=_backups)
+    _rank_indexes.clear()
+    _todo_indexes.clear()
+    _streak_index = None
+    await _run_io(_ensure_files)
+    for store in _stores.values():
+        if not store.loaded:
+            await _run_io(store.load)
+    _focus = FocusLog(DATA_DIR / "focus", fsync=fsync)
+    await _migrate_focus_logs()
+    await _migrate_todos()
+    for order in RANKED_ORDERS:
+        _rank_index(order)
+    loop = asyncio.get_running_loop()
+    if _flusher is None:
+        _flush_wakeup = asyncio.Event()
+        _flusher = loop.create_task(_flush_loop())
+    if _compactor is None:
+        _compact_wakeup = asyncio.Event()
+        _compactor = loop.create_task(_compact_loop())
+
+
+async def close() -> None:
+    """Stop background tasks and persist everything still dirty. Call on shutdown."""
+    global _flusher, _compactor
+    for task in (_flusher, _compactor):
+        if task is not None:
+            task.cancel()
+    _flusher = _compactor = None
+    await flush()
+    await compact()
 
 
 # Users
-async def get_user(user_id: int) -> Dict[str, Any]:
-    data = await _read(USERS_PATH)
+def _with_defaults(stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     base = {
         "xp": 0,
         "streak": 0,
-        "todos": [],
         "pomos_completed": 0,
         "achievements": [],
         "presets": [],
-        "focus_log": [],
         "coins": 0,
         "monthly_xp": 0,
         "theme": "aurora",
@@ -76,7 +396,6 @@ async def get_user(user_id: int) -> Dict[str, Any]:
         "afk_strikes": 0,
         "pending_ack": {},
     }
-    stored = data.get(str(user_id))
     if not stored:
         return base
     # Backfill missing keys for older users
@@ -85,52 +404,513 @@ async def get_user(user_id: int) -> Dict[str, Any]:
     return stored
 
 
+async def get_user(user_id: int) -> Dict[str, Any]:
+    return _with_defaults(await _read_key(USERS_PATH, str(user_id)))
+
+
 async def set_user(user_id: int, payload: Dict[str, Any]) -> None:
-    data = await _read(USERS_PATH)
-    data[str(user_id)] = payload
-    await _write(USERS_PATH, data)
+    async with _key_lock(USERS_PATH, str(user_id)):
+        store = await _loaded(USERS_PATH)
+        store.set(str(user_id), payload)
+        _index_user(USERS_PATH, user_id, payload)
+    _after_write(store)
+
+
+@asynccontextmanager
+async def user_txn(user_id: int):
+    """Atomic read-modify-write of one user record.
+
+        async with db.user_txn(uid) as u:
+            u["coins"] = int(u.get("coins", 0)) + 5
+
+    The record is written back when the block exits without an exception.
+    Don't call set_user/update_user for the same user inside the block.
+    """
+    key = str(user_id)
+    async with _key_lock(USERS_PATH, key):
+        store = await _loaded(USERS_PATH)
+        user = _with_defaults(store.get(key))
+        yield user
+        store.set(key, user)
+        _index_user(USERS_PATH, user_id, user)
+    _after_write(store)
+
+
+def _index_user(path: Path, user_id: int, user: Dict[str, Any]) -> None:
+    for order in RANKED_ORDERS:
+        index = _rank_indexes.get((path, order))
+        if index is not None:
+            index.update(user_id, user)
+    if path == USERS_PATH and _streak_index is not None:
+        _track_streak(_streak_index, int(user_id), user)
+
+
+def _track_streak(index: Dict[int, int], user_id: int, user: Dict[str, Any]) -> None:
+    if int(user.get("streak", 0) or 0) > 0:
+        index[user_id] = int(user.get("last_active_day", 0) or 0)
+    else:
+        index.pop(user_id, None)
+
+
+def _rank_index(order: Sequence[str], path: Optional[Path] = None) -> Optional[RankIndex]:
+    order = tuple(order)
+    path = path or USERS_PATH
+    if order not in RANKED_ORDERS:
+        return None
+    index = _rank_indexes.get((path, order))
+    if index is None:
+        index = _rank_indexes[(path, order)] = RankIndex(order)
+        index.build((int(uid), u) for uid, u in _store(path).load().items())
+    return index
+
+
+async def get_all_users() -> Dict[str, Dict[str, Any]]:
+    return await _read(USERS_PATH)
+
+
+async def streak_candidates(before_day: int) -> List[int]:
+    """Ids of users with a positive streak whose last active day is before
+    before_day (a date ordinal), sorted. No records are copied."""
+    global _streak_index
+    store = await _loaded(USERS_PATH)
+    if _streak_index is None:
+        _streak_index = {}
+        for uid, u in store.load().items():
+            _track_streak(_streak_index, int(uid), u)
+    return sorted(uid for uid, last in _streak_index.items() if last < before_day)
+
+
+async def top_users(order: Sequence[str] = ("xp",), limit: int = 10,
+                    guild_id: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """Top users ordered by the given fields (descending), e.g. ("monthly_xp", "xp").
+
+    With guild_id the ranking uses XP earned in that guild and each record is
+    the guild member record ({"xp", "monthly_xp"}).
+    """
+    if guild_id is not None:
+        path = await _guild_store(guild_id, "members")
+        store = await _loaded(path)
+        return [(key[-1], _member_defaults(store.get(str(key[-1])))) for key in _rank_index(order, path).top(limit)]
+    store = await _loaded(USERS_PATH)
+    index = _rank_index(order)
+    if index is not None:
+        return [(key[-1], _with_defaults(store.get(str(key[-1])))) for key in index.top(limit)]
+    if isinstance(store, SqliteStore):
+        await flush()
+        rows = await _run_io(store.top, tuple(order), limit)
+    else:
+        rows = store.top(order, limit)
+    return [(int(uid), u) for uid, u in rows]
+
+
+async def user_rank(user_id: int, order: Sequence[str] = ("xp",), guild_id: Optional[int] = None) -> Optional[int]:
+    """1-based leaderboard position of a user for one of RANKED_ORDERS, None if unknown."""
+    path = USERS_PATH if guild_id is None else await _guild_store(guild_id, "members")
+    await _loaded(path)
+    index = _rank_index(order, path)
+    if index is None:
+        raise ValueError(f"no rank index for {tuple(order)}")
+    return index.rank(user_id)
+
+
+async def monthly_xp_snapshot(guild_id: Optional[int] = None) -> Dict[str, int]:
+    """Every non-zero monthly_xp (user id -> amount), taken at the same moment
+    the monthly index is rebuilt from the xp index. First step of a reset."""
+    path = USERS_PATH if guild_id is None else await _guild_store(guild_id, "members")
+    store = await _loaded(path)
+    snapshot = {uid: int(u.get("monthly_xp", 0) or 0) for uid, u in store.load().items()}
+    _rank_index(("monthly_xp", "xp"), path).zero_leading(_rank_index(("xp",), path))
+    return {uid: earned for uid, earned in snapshot.items() if earned}
+
+
+async def subtract_monthly_xp(amounts: Dict[str, int], guild_id: Optional[int] = None,
+                              run: Optional[str] = None) -> int:
+    """Subtract a monthly_xp_snapshot() from the records, one lock at a time.
+    Returns how many records changed.
+
+    XP granted after the snapshot survives in both the record and the index,
+    because only the snapshotted amount is subtracted. With run set, each
+    record is stamped with it ("monthly_reset") in the same write and records
+    already carrying the stamp are skipped, so a reset that died part-way can
+    be finished with the same amounts without subtracting anything twice.
+    """
+    path = USERS_PATH if guild_id is None else await _guild_store(guild_id, "members")
+    store = await _loaded(path)
+    changed = 0
+    for n, (uid, earned) in enumerate(list(amounts.items())):
+        if n % JOB_CHUNK == 0:
+            await asyncio.sleep(0)
+        async with _key_lock(path, uid):
+            record = store.get(uid)
+            if record is None or (run is not None and record.get("monthly_reset") == run):
+                continue
+            record["monthly_xp"] = max(0, int(record.get("monthly_xp", 0) or 0) - int(earned))
+            if run is not None:
+                record["monthly_reset"] = run
+            store.set(uid, record)
+            _index_user(path, int(uid), record)
+        changed += 1
+    _after_write(store)
+    return changed
+
+
+async def reset_monthly_xp(guild_id: Optional[int] = None) -> int:
+    """Zero monthly_xp for every user (month rollover) in one go. Returns how many records changed.
+
+    XP granted while the reset runs is kept. The rollover job uses the two
+    steps separately so it can checkpoint the snapshot in between.
+    """
+    return await subtract_monthly_xp(await monthly_xp_snapshot(guild_id), guild_id)
 
 
 async def update_user(user_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
-    user = await get_user(user_id)
-    user.update(patch)
-    await set_user(user_id, user)
+    async with user_txn(user_id) as user:
+        user.update(patch)
     return user
 
 
-# Sessions (Pomodoro)
-async def get_session(channel_id: int) -> Dict[str, Any]:
-    data = await _read(SESSIONS_PATH)
-    return data.get(str(channel_id), {})
+async def apply_afk_results(results: Sequence[Tuple[int, bool]]) -> Dict[int, int]:
+    """Apply a batch of AFK prompt outcomes (user_id, reacted): a reaction clears
+    afk_strikes, a timeout adds one. Returns each user's new strike count."""
+    store = await _loaded(USERS_PATH)
+    strikes: Dict[int, int] = {}
+    for user_id, reacted in results:
+        key = str(user_id)
+        async with _key_lock(USERS_PATH, key):
+            user = _with_defaults(store.get(key))
+            user["afk_strikes"] = 0 if reacted else int(user.get("afk_strikes", 0)) + 1
+            store.set(key, user)
+        strikes[int(user_id)] = user["afk_strikes"]
+    if strikes:
+        _after_write(store)
+    return strikes
+
+
+# To-dos (see utils.todos): one document per user in the todos collection
+_EMPTY_TODOS: Dict[str, Any] = {"next_id": 1, "items": {}}
+
+
+def _todo_index(user_id: int) -> TodoIndex:
+    index = _todo_indexes.get(int(user_id))
+    if index is None:
+        doc = _store(TODOS_PATH).load().get(str(user_id)) or _EMPTY_TODOS
+        index = _todo_indexes[int(user_id)] = TodoIndex(doc["items"])
+    return index
+
+
+async def get_todos(user_id: int, status: Optional[str] = None,
+                    category: Optional[str] = None) -> List[Tuple[int, Dict[str, Any]]]:
+    """(id, item) pairs matching the filters, oldest first. Only matching items are copied."""
+    store = await _loaded(TODOS_PATH)
+    ids = _todo_index(user_id).select(status, category)
+    items = (store.load().get(str(user_id)) or _EMPTY_TODOS)["items"]
+    return [(i, dict(items[str(i)])) for i in ids]
+
+
+async def todo_counts(user_id: int, statuses: Sequence[str], categories: Sequence[str],
+                      now: Optional[float] = None) -> Dict[str, Any]:
+    """{"total", "status": {s: n}, "category": {c: n}, "overdue"} from the indexes alone."""
+    await _loaded(TODOS_PATH)
+    index = _todo_index(user_id)
+    counts: Dict[str, Any] = index.counts(statuses, categories)
+    counts["total"] = len(index.ids)
+    counts["overdue"] = index.overdue(time.time() if now is None else now)
+    return counts
+
+
+async def add_todo(user_id: int, todo: Dict[str, Any]) -> int:
+    key = str(user_id)
+    async with _key_lock(TODOS_PATH, key):
+        store = await _loaded(TODOS_PATH)
+        # Build the index before the write, or a cold index would pick the new item up twice
+        index = _todo_index(user_id)
+        doc = store.get(key) or {"next_id": 1, "items": {}}
+        todo_id = int(doc["next_id"])
+        doc["items"][str(todo_id)] = dict(todo)
+        doc["next_id"] = todo_id + 1
+        store.set(key, doc)
+        index.add(todo_id, todo)
+    _after_write(store)
+    return todo_id
+
+
+async def update_todo(user_id: int, todo_id: int, patch: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Apply patch to one item. Returns (before, after), or None when the id doesn't exist."""
+    key = str(user_id)
+    async with _key_lock(TODOS_PATH, key):
+        store = await _loaded(TODOS_PATH)
+        index = _todo_index(user_id)
+        doc = store.get(key)
+        old = doc["items"].get(str(todo_id)) if doc else None
+        if old is None:
+            return None
+        new = {**old, **patch}
+        doc["items"][str(todo_id)] = new
+        store.set(key, doc)
+        index.update(int(todo_id), old, new)
+    _after_write(store)
+    return old, new
+
+
+async def complete_todo(user_id: int, todo_id: int,
+                        credit: Callable[[Dict[str, Any], Dict[str, Any]], int]) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Mark one item Done and reward the user for it in a single step.
+
+    credit(user, item) applies the reward to the user record and returns the
+    XP granted. It runs under both the to-do and the user lock, and only when
+    the item was not already Done, so an item is rewarded at most once.
+    Returns (item, xp): (None, 0) when the id doesn't exist, xp 0 when the
+    item was already Done.
+    """
+    key = str(user_id)
+    async with _locked_pairs((TODOS_PATH, key), (USERS_PATH, key)):
+        todos, users = await _loaded(TODOS_PATH), await _loaded(USERS_PATH)
+        index = _todo_index(user_id)
+        doc = todos.get(key)
+        old = doc["items"].get(str(todo_id)) if doc else None
+        if old is None or old.get("status") == DONE:
+            return old, 0
+        new = {**old, "status": DONE}
+        doc["items"][str(todo_id)] = new
+        todos.set(key, doc)
+        index.update(int(todo_id), old, new)
+        user = _with_defaults(users.get(key))
+        xp = credit(user, new)
+        users.set(key, user)
+        _index_user(USERS_PATH, user_id, user)
+    _after_write(todos)
+    _after_write(users)
+    return new, xp
+
+
+async def _migrate_todos() -> int:
+    """Move todos lists out of user records into the todos collection, numbering items 1..n.
+
+    The to-dos are flushed before the lists are dropped from the user
+    records, so a crash part-way leaves the lists in place to migrate again.
+    """
+    users = await _loaded(USERS_PATH)
+    todos = await _loaded(TODOS_PATH)
+    legacy = [int(uid) for uid, u in users.load().items() if "todos" in u]
+    for uid in legacy:
+        items = legacy_items(users.load()[str(uid)]["todos"])
+        if items and todos.get(str(uid)) is None:
+            async with _key_lock(TODOS_PATH, str(uid)):
+                todos.set(str(uid), {"next_id": len(items) + 1,
+                                     "items": {str(i): t for i, t in enumerate(items, start=1)}})
+            _todo_indexes.pop(uid, None)
+    if legacy:
+        await flush()
+    for uid in legacy:
+        async with user_txn(uid) as user:
+            user.pop("todos", None)
+    return len(legacy)
+
+
+# Focus history (timestamps of completed focus phases)
+def _focus_log() -> FocusLog:
+    global _focus
+    if _focus is None:
+        _focus = FocusLog(DATA_DIR / "focus")
+    return _focus
+
+
+async def append_focus(user_id: int, ts: int) -> None:
+    await _run_io(_focus_log().append, int(user_id), int(ts))
+
+
+async def focus_range(user_id: int, start: int = 0, end: Optional[int] = None) -> List[int]:
+    """Completion timestamps with start <= ts < end, oldest first."""
+    return await _run_io(_focus_log().range, int(user_id), int(start), end)
+
+
+async def focus_count(user_id: int) -> int:
+    return await _run_io(_focus_log().count, int(user_id))
+
+
+async def _migrate_focus_logs() -> int:
+    """Move focus_log lists out of user records into the binary focus files.
+
+    Aggregates are computed from the list first for records that lack them.
+    The files merge without duplicates, so a crash part-way is safe to rerun.
+    """
+    store = await _loaded(USERS_PATH)
+    moved = 0
+    for uid, u in list(store.load().items()):
+        if "focus_log" not in u:
+            continue
+        await _run_io(_focus_log().extend, int(uid), u["focus_log"])
+        async with user_txn(int(uid)) as user:
+            if not user.get("focus_stats"):
+                user["focus_stats"] = focusstats.rebuild(user.get("focus_log", []), tz.for_user(user))
+            user.pop("focus_log", None)
+        moved += 1
+    return moved
 
 
-async def set_session(channel_id: int, payload: Dict[str, Any]) -> None:
-    data = await _read(SESSIONS_PATH)
-    data[str(channel_id)] = payload
-    await _write(SESSIONS_PATH, data)
+# Sessions (Pomodoro)
+async def get_session(channel_id: int) -> Dict[str, Any]:
+    return await _read_key(SESSIONS_PATH, str(channel_id), {})
 
 
-async def delete_session(channel_id: int) -> None:
-    data = await _read(SESSIONS_PATH)
-    if str(channel_id) in data:
-        del data[str(channel_id)]
-        await _write(SESSIONS_PATH, data)
+async def get_sessions() -> Dict[str, Dict[str, Any]]:
+    return await _read(SESSIONS_PATH)
 
 
-# Challenges (weekly server goal - simplified global for now)
-async def get_challenge() -> Dict[str, Any]:
-    return await _read(CHALLENGES_PATH)
+async def set_session(channel_id: int, payload: Dict[str, Any]) -> None:
+    await _write_key(SESSIONS_PATH, str(channel_id), payload)
 
 
-async def set_challenge(payload: Dict[str, Any]) -> None:
-    await _write(CHALLENGES_PATH, payload)
+async def delete_session(channel_id: int) -> None:
+    await _delete_key(SESSIONS_PATH, str(channel_id))
+
+
+# Guild members (XP earned per guild, for guild leaderboards)
+def _member_defaults(stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    member = stored or {}
+    member.setdefault("xp", 0)
+    member.setdefault("monthly_xp", 0)
+    return member
+
+
+async def get_member(guild_id: int, user_id: int) -> Dict[str, Any]:
+    return _member_defaults(await _read_key(await _guild_store(guild_id, "members"), str(user_id)))
+
+
+async def add_member_xp(guild_id: int, user_id: int, delta: int) -> Dict[str, Any]:
+    """Add XP (and monthly XP) earned in one guild."""
+    path = await _guild_store(guild_id, "members")
+    key = str(user_id)
+    async with _key_lock(path, key):
+        store = await _loaded(path)
+        member = _member_defaults(store.get(key))
+        member["xp"] = int(member["xp"]) + int(delta)
+        member["monthly_xp"] = int(member["monthly_xp"]) + int(delta)
+        store.set(key, member)
+        _index_user(path, user_id, member)
+    _after_write(store)
+    return member
+
+
+async def guild_ids() -> List[int]:
+    """Every guild that has shards, loaded or not."""
+    return [int(gid) for gid in (await _loaded(GUILDS_PATH)).load()]
+
+
+async def migrate_guild(guild_id: int, member_ids: Sequence[int]) -> bool:
+    """Seed a guild's shards from the old global files, once per guild.
+
+    Global records carry no guild, so every listed member gets their global
+    XP and monthly XP, the global challenge is copied if the guild has none,
+    and past Hall of Fame months keep only this guild's members. Returns
+    True if the guild was migrated by this call.
+    """
+    registry = await _loaded(GUILDS_PATH)
+    gid = str(int(guild_id))
+    if int((registry.get(gid) or {}).get("migrated", 0)):
+        return False
+    members_path = await _guild_store(guild_id, "members")
+    members = await _loaded(members_path)
+    users = await _loaded(USERS_PATH)
+    for uid in member_ids:
+        u = users.get(str(uid))
+        if not u:
+            continue
+        # Global XP already includes anything earned here since sharding began
+        async with _key_lock(members_path, str(uid)):
+            member = {"xp": int(u.get("xp", 0)), "monthly_xp": int(u.get("monthly_xp", 0))}
+            members.set(str(uid), member)
+            _index_user(members_path, int(uid), member)
+    _after_write(members)
+    glob_ch = await _read(CHALLENGES_PATH)
+    async with _doc_txn(await _guild_store(guild_id, "challenges")) as ch:
+        if not int(ch.get("goal", 0)) and int(glob_ch.get("goal", 0)):
+            ch.update(glob_ch)
+    ids = {int(uid) for uid in member_ids}
+    glob_hof = await _read(HOF_PATH)
+    async with _doc_txn(await _guild_store(guild_id, "hall_of_fame")) as hof:
+        for month, top in glob_hof.items():
+            if month not in hof:
+                hof[month] = [r for r in top if int(r.get("user_id", 0)) in ids]
+    async with _key_lock(GUILDS_PATH, gid):
+        registry.set(gid, {"migrated": int(time.time())})
+    _after_write(registry)
+    return True
+
+
+async def migrate_to_guild_shards(guilds: Dict[int, Sequence[int]]) -> int:
+    """One-time split of the global files into shards for the guilds the bot is in.
+
+    guilds maps guild id -> member ids. Once every guild has been migrated
+    the season state records it, so guilds joined later start empty instead
+    of inheriting XP earned elsewhere. Returns how many guilds were migrated.
+    """
+    state = await get_season_state()
+    if state.get("sharded_at"):
+        return 0
+    migrated = 0
+    for guild_id, member_ids in guilds.items():
+        if await migrate_guild(guild_id, member_ids):
+            migrated += 1
+    async with _doc_txn(SEASON_STATE_PATH) as state:
+        state["sharded_at"] = int(time.time())
+    return migrated
+
+
+# Reminders (/remindme), keyed by reminder id:
+# {"user_id": int, "due": unix ts, "message": str, "created": unix ts, "attempts": int}
+async def get_reminders() -> Dict[str, Dict[str, Any]]:
+    return await _read(REMINDERS_PATH)
+
+
+async def add_reminder(user_id: int, due: float, message: str) -> str:
+    rid = secrets.token_hex(8)
+    await _write_key(REMINDERS_PATH, rid, {
+        "user_id": int(user_id),
+        "due": int(due),
+        "message": message,
+        "created": int(time.time()),
+        "attempts": 0,
+    })
+    return rid
+
+
+async def get_reminder(reminder_id: str) -> Optional[Dict[str, Any]]:
+    return await _read_key(REMINDERS_PATH, reminder_id)
+
+
+async def set_reminder(reminder_id: str, payload: Dict[str, Any]) -> None:
+    await _write_key(REMINDERS_PATH, reminder_id, payload)
+
+
+async def delete_reminder(reminder_id: str) -> None:
+    await _delete_key(REMINDERS_PATH, reminder_id)
+
+
+# Challenges (weekly server goal; global when no guild is given)
+async def _challenge_path(guild_id: Optional[int]) -> Path:
+    return CHALLENGES_PATH if guild_id is None else await _guild_store(guild_id, "challenges")
+
+
+async def get_challenge(guild_id: Optional[int] = None) -> Dict[str, Any]:
+    return await _read(await _challenge_path(guild_id))
+
+
+async def set_challenge(payload: Dict[str, Any], guild_id: Optional[int] = None) -> None:
+    await _write(await _challenge_path(guild_id), payload)
+
+
+async def increment_challenge(delta: int = 1, guild_id: Optional[int] = None) -> Dict[str, Any]:
+    async with _doc_txn(await _challenge_path(guild_id)) as ch:
+        ch["progress"] = int(ch.get("progress", 0)) + int(delta)
+    return ch
 
 
-async def increment_challenge(delta: int = 1) -> Dict[str, Any]:
-    ch = await get_challenge()
-    ch["progress"] = int(ch.get("progress", 0)) + int(delta)
-    await set_challenge(ch)
-    return ch
+@asynccontextmanager
+async def challenge_txn(guild_id: Optional[int] = None):
+    """Atomic read-modify-write of the challenge document (async context manager)."""
+    async with _doc_txn(await _challenge_path(guild_id)) as ch:
+        yield ch
 
 
 # Partners (pairing users)
@@ -139,24 +919,29 @@ async def get_partners() -> Dict[str, Any]:
 
 
 async def set_partner(user_id: int, partner_id: int) -> None:
-    data = await _read(PARTNERS_PATH)
-    data[str(user_id)] = int(partner_id)
-    data[str(partner_id)] = int(user_id)
-    await _write(PARTNERS_PATH, data)
+    async with _locked(PARTNERS_PATH, str(user_id), str(partner_id)):
+        store = await _loaded(PARTNERS_PATH)
+        store.set(str(user_id), int(partner_id))
+        store.set(str(partner_id), int(user_id))
+    _after_write(store)
 
 
 async def clear_partner(user_id: int) -> None:
-    data = await _read(PARTNERS_PATH)
-    pid = data.get(str(user_id))
-    if pid is not None:
-        data.pop(str(user_id), None)
-        data.pop(str(pid), None)
-        await _write(PARTNERS_PATH, data)
+    pid = await _read_key(PARTNERS_PATH, str(user_id))
+    if pid is None:
+        return
+    async with _locked(PARTNERS_PATH, str(user_id), str(pid)):
+        store = await _loaded(PARTNERS_PATH)
+        # Re-check: the pairing may have changed while waiting for the locks
+        if store.get(str(user_id)) == pid:
+            store.delete(str(user_id))
+            if store.get(str(pid)) == int(user_id):
+                store.delete(str(pid))
+    _after_write(store)
 
 
 async def find_partner(user_id: int) -> int:
-    data = await _read(PARTNERS_PATH)
-    return int(data.get(str(user_id), 0))
+    return int(await _read_key(PARTNERS_PATH, str(user_id), 0))
 
 
 # Shop
@@ -168,13 +953,22 @@ async def set_shop(payload: Dict[str, Any]) -> None:
     await _write(SHOP_PATH, payload)
 
 
+def shop_txn():
+    """Atomic read-modify-write of the shop document (async context manager)."""
+    return _doc_txn(SHOP_PATH)
+
+
 # Hall of Fame and Season
-async def get_hof() -> Dict[str, Any]:
-    return await _read(HOF_PATH)
+async def _hof_path(guild_id: Optional[int]) -> Path:
+    return HOF_PATH if guild_id is None else await _guild_store(guild_id, "hall_of_fame")
 
 
-async def set_hof(payload: Dict[str, Any]) -> None:
-    await _write(HOF_PATH, payload)
+async def get_hof(guild_id: Optional[int] = None) -> Dict[str, Any]:
+    return await _read(await _hof_path(guild_id))
+
+
+async def set_hof(payload: Dict[str, Any], guild_id: Optional[int] = None) -> None:
+    await _write(await _hof_path(guild_id), payload)
 
 
 async def get_season_state() -> Dict[str, Any]:
@@ -183,3 +977,15 @@ async def get_season_state() -> Dict[str, Any]:
 
 async def set_season_state(payload: Dict[str, Any]) -> None:
     await _write(SEASON_STATE_PATH, payload)
+
+
+def season_txn():
+    """Atomic read-modify-write of the season state document (async context manager)."""
+    return _doc_txn(SEASON_STATE_PATH)
+
+
+if __name__ == "__main__":
+    # One-shot migration: python -m utils.database [path/to/aurora.db]
+    import sys
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else SQLITE_PATH
+    print(f"Migrated {migrate_json_to_sqlite(target, force=True)} collections into {target}")
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import Any, Dict, Hashable, Optional
+
+import discord
+
+
+# Discord allows roughly 5 message edits per 5 seconds per channel.
+CHANNEL_EDITS = 5
+CHANNEL_WINDOW_SEC = 5.0
+# Tokens countdown edits leave untouched so phase transitions can always go out
+PRIORITY_RESERVE = 1
+
+
+def refresh_cadence(remaining: int, interval: int) -> int:
+    """Seconds until the next countdown refresh: coarse for long phases, fine near the end."""
+    if remaining > 600:
+        return max(interval, 60)
+    if remaining > 120:
+        return max(interval, 15)
+    return interval
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, window: float):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, reserve: int = 0) -> bool:
+        self._refill()
+        if self.tokens - 1 < reserve:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def take(self) -> None:
+        while not self.try_take():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class EmbedEditDispatcher:
+    """Sends message edits only when the embed changed and the channel has budget.
+
+    Countdown edits are dropped when the embed is identical to the last one
+    sent for that key, or when the channel's bucket is down to its priority
+    reserve (the next refresh simply shows newer data). Priority edits, used
+    for phase transitions, wait for a token instead of being dropped.
+    """
+
+    def __init__(self, capacity: int = CHANNEL_EDITS, window: float = CHANNEL_WINDOW_SEC):
+        self.capacity = capacity
+        self.window = window
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._last: Dict[Hashable, Dict[str, Any]] = {}
+        self._opened: Dict[Hashable, float] = {}
+        self._closed_seconds = 0.0
+        # Counters
+        self.sent = 0
+        self.skipped_same = 0
+        self.deferred = 0
+
+    def _bucket(self, channel_id: int) -> TokenBucket:
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = TokenBucket(self.capacity, self.window)
+        return bucket
+
+    async def edit(self, key: Hashable, message: discord.Message, embed: discord.Embed, priority: bool = False) -> bool:
+        """Edit message unless it would be a no-op or over budget. Returns True if sent."""
+        self._opened.setdefault(key, time.time())
+        payload = embed.to_dict()
+        if self._last.get(key) == payload:
+            self.skipped_same += 1
+            return False
+        bucket = self._bucket(getattr(message.channel, "id", 0))
+        if priority:
+            await bucket.take()
+        elif not bucket.try_take(reserve=PRIORITY_RESERVE):
+            self.deferred += 1
+            return False
+        await message.edit(embed=embed)
+        self._last[key] = payload
+        self.sent += 1
+        return True
+
+    def forget(self, key: Hashable, channel_id: Optional[int] = None) -> None:
+        self._last.pop(key, None)
+        opened = self._opened.pop(key, None)
+        if opened is not None:
+            self._closed_seconds += time.time() - opened
+        if channel_id is not None:
+            self._buckets.pop(channel_id, None)
+
+    def session_hours(self) -> float:
+        now = time.time()
+        return (self._closed_seconds + sum(now - t for t in self._opened.values())) / 3600
+
+    def stats(self) -> Dict[str, float]:
+        saved = self.skipped_same + self.deferred
+        hours = self.session_hours()
+        return {
+            "sent": self.sent,
+            "skipped_same": self.skipped_same,
+            "deferred": self.deferred,
+            "saved_per_session_hour": round(saved / hours, 1) if hours > 0 else 0.0,
+            "sent_per_session_hour": round(self.sent / hours, 1) if hours > 0 else 0.0,
+        }
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+logger = logging.getLogger("aurorafocus")
+
+# Defaults per subscriber
+QUEUE_SIZE = 256
+WORKERS = 1
+
+
+class FocusCompleted(NamedTuple):
+    """A focus phase finished. live is False for completions credited after a restart."""
+    user_id: int
+    when_ts: float
+    guild_id: Optional[int] = None
+    channel_id: Optional[int] = None
+    live: bool = True
+
+
+class _Subscriber:
+    def __init__(self, name: str, event_type: Type, handler: Callable[[Any], Awaitable[None]],
+                 queue_size: int, workers: int, drop_when_full: bool):
+        self.name = name
+        self.event_type = event_type
+        self.handler = handler
+        self.drop_when_full = drop_when_full
+        self.queue: "asyncio.Queue[Tuple[float, Any]]" = asyncio.Queue(maxsize=max(1, int(queue_size)))
+        self.tasks: List[asyncio.Task] = []
+        self.workers = max(1, int(workers))
+        # Counters
+        self.handled = 0
+        self.failed = 0
+        self.dropped = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.max_wait = 0.0
+        self.max_run = 0.0
+
+    async def _work(self) -> None:
+        while True:
+            queued_at, event = await self.queue.get()
+            started = time.monotonic()
+            try:
+                await self.handler(event)
+                self.handled += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Event subscriber %s failed on %s", self.name, type(event).__name__)
+            finally:
+                done = time.monotonic()
+                self.wait_total += started - queued_at
+                self.run_total += done - started
+                self.max_wait = max(self.max_wait, started - queued_at)
+                self.max_run = max(self.max_run, done - started)
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, float]:
+        n = max(1, self.handled + self.failed)
+        return {
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "handled": self.handled,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_total / n * 1000, 1),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "avg_run_ms": round(self.run_total / n * 1000, 1),
+            "max_run_ms": round(self.max_run * 1000, 1),
+        }
+
+
+class EventBus:
+    """In-process publish/subscribe with one bounded queue and worker task(s) per subscriber.
+
+    publish() hands the event to every subscriber of its type and returns
+    without running any handler, so a slow Discord send in one subscriber
+    never delays the publisher or the other subscribers. When a queue is
+    full, subscribers created with drop_when_full (notifications) lose the
+    event and count it; the others (rewards, counters) make publish() wait
+    for room, pushing back on the publisher instead of growing without bound.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, _Subscriber] = {}
+
+    def subscribe(self, event_type: Type, name: str, handler: Callable[[Any], Awaitable[None]],
+                  queue_size: int = QUEUE_SIZE, workers: int = WORKERS, drop_when_full: bool = False) -> None:
+        """Register handler(event) under a unique name. Must be called from the running event loop."""
+        self.unsubscribe(name)
+        sub = _Subscriber(name, event_type, handler, queue_size, workers, drop_when_full)
+        loop = asyncio.get_running_loop()
+        sub.tasks = [loop.create_task(sub._work()) for _ in range(sub.workers)]
+        self._subscribers[name] = sub
+
+    def unsubscribe(self, name: str) -> None:
+        sub = self._subscribers.pop(name, None)
+        if sub is not None:
+            for task in sub.tasks:
+                task.cancel()
+
+    async def publish(self, event: Any) -> int:
+        """Queue event for every matching subscriber. Returns how many accepted it."""
+        accepted = 0
+        now = time.monotonic()
+        for sub in list(self._subscribers.values()):
+            if not isinstance(event, sub.event_type):
+                continue
+            try:
+                sub.queue.put_nowait((now, event))
+            except asyncio.QueueFull:
+                if sub.drop_when_full:
+                    sub.dropped += 1
+                    continue
+                sub.waited += 1
+                await sub.queue.put((now, event))
+            accepted += 1
+        return accepted
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Let queued events finish (up to timeout), then stop every worker."""
+        subs = list(self._subscribers.values())
+        try:
+            await asyncio.wait_for(asyncio.gather(*(s.queue.join() for s in subs)), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Event bus closed with %d events still queued", sum(s.queue.qsize() for s in subs))
+        for name in list(self._subscribers):
+            self.unsubscribe(name)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: sub.stats() for name, sub in self._subscribers.items()}
+
+
+def for_bot(bot: Any) -> EventBus:
+    """The bot's shared bus (bot.bus), created on first use."""
+    bus = getattr(bot, "bus", None)
+    if bus is None:
+        bus = EventBus()
+        bot.bus = bus
+    return bus
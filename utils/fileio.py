@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import stat
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger("aurorafocus")
+
+# Process umask, for the mode of files created from scratch (os.umask can only be read by setting it)
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def _fsync_dir(directory: Path) -> None:
+    # Make the rename itself durable; not supported on Windows
+    if os.name != "posix":
+        return
+    fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def backup_path(path: Path, n: int) -> Path:
+    return path.with_name(f"{path.name}.bak{n}")
+
+
+def atomic_write_bytes(path: Path, data: bytes, fsync: bool = True, backups: int = 0) -> None:
+    """Replace path with data so readers only ever see the old or the new file.
+
+    The data goes to a temp file in the same directory, which is optionally
+    fsynced and then renamed over path. With backups > 0 the previous file is
+    kept as path.bak1 (older ones shift up to path.bak<backups>).
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        # mkstemp creates the file 0600; keep the mode of the file being replaced
+        os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode) if path.exists() else 0o666 & ~_UMASK)
+        if backups > 0 and path.exists():
+            for n in range(backups - 1, 0, -1):
+                if backup_path(path, n).exists():
+                    os.replace(backup_path(path, n), backup_path(path, n + 1))
+            os.replace(path, backup_path(path, 1))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def atomic_write_text(path: Path, text: str, fsync: bool = True, backups: int = 0) -> None:
+    atomic_write_bytes(path, text.encode("utf-8"), fsync=fsync, backups=backups)
+
+
+def atomic_write_json(path: Path, data: Any, fsync: bool = True, backups: int = 0) -> None:
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2), fsync=fsync, backups=backups)
+
+
+def read_json_with_fallback(path: Path, backups: int = 0) -> Tuple[Optional[Any], Optional[Path]]:
+    """Load path, falling back to the newest backup that still decodes.
+
+    Returns (data, source) or (None, None) when nothing usable exists. A main
+    file that exists but fails to decode is moved aside as path.corrupt-<ts>
+    so it is never silently overwritten.
+    """
+    candidates = [path] + [backup_path(path, n) for n in range(1, backups + 1)]
+    for candidate in candidates:
+        try:
+            text = candidate.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        try:
+            return json.loads(text or "{}"), candidate
+        except json.JSONDecodeError:
+            logger.error("Could not decode %s; trying older snapshots", candidate)
+            if candidate == path:
+                aside = path.with_name(f"{path.name}.corrupt-{int(time.time())}")
+                os.replace(path, aside)
+                logger.error("Moved unreadable %s to %s", path, aside)
+    return None, None
@@ -0,0 +1,110 @@
+import bisect
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .fileio import atomic_write_bytes
+
+# Focus history, one file per user: data/focus/<user_id>.bin holds sorted
+# uint32 Unix timestamps, little-endian, 4 bytes each. Appends are O(1) and a
+# time-window query maps the file and bisects it, so history is unbounded
+# without growing users.json. All methods block; utils.database runs them on
+# its I/O thread.
+
+ITEM_SIZE = 4
+
+
+def _to_le(values: array) -> array:
+    if array("I").itemsize != ITEM_SIZE:
+        raise RuntimeError("array('I') is not 32-bit on this platform")
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class FocusLog:
+    def __init__(self, root: Path, fsync: bool = True):
+        self.root = root
+        self.fsync = fsync
+
+    def path(self, user_id: int) -> Path:
+        return self.root / f"{int(user_id)}.bin"
+
+    def _read_all(self, user_id: int) -> array:
+        values = array("I")
+        try:
+            data = self.path(user_id).read_bytes()
+        except FileNotFoundError:
+            return values
+        # Ignore a torn trailing record from a crash mid-append
+        values.frombytes(data[:len(data) - len(data) % ITEM_SIZE])
+        return _to_le(values)
+
+    def _rewrite(self, user_id: int, values: array) -> None:
+        atomic_write_bytes(self.path(user_id), _to_le(array("I", values)).tobytes(), fsync=self.fsync)
+
+    def _last(self, user_id: int) -> Optional[int]:
+        path = self.path(user_id)
+        try:
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell() - f.tell() % ITEM_SIZE
+                if size < ITEM_SIZE:
+                    return None
+                f.seek(size - ITEM_SIZE)
+                return int.from_bytes(f.read(ITEM_SIZE), "little")
+        except FileNotFoundError:
+            return None
+
+    def append(self, user_id: int, ts: int) -> None:
+        ts = int(ts)
+        self.root.mkdir(parents=True, exist_ok=True)
+        last = self._last(user_id)
+        if last is not None and ts < last:
+            # Late arrival (e.g. credited after a restart): keep the file sorted
+            values = self._read_all(user_id)
+            values.insert(bisect.bisect_right(values, ts), ts)
+            self._rewrite(user_id, values)
+            return
+        with open(self.path(user_id), "ab") as f:
+            if f.tell() % ITEM_SIZE:
+                f.truncate(f.tell() - f.tell() % ITEM_SIZE)
+            f.write(ts.to_bytes(ITEM_SIZE, "little"))
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def extend(self, user_id: int, timestamps: Iterable[int]) -> None:
+        """Merge many timestamps into the user's history, skipping ones already there."""
+        merged = sorted(set(self._read_all(user_id)).union(int(t) for t in timestamps))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._rewrite(user_id, array("I", merged))
+
+    def count(self, user_id: int) -> int:
+        try:
+            return self.path(user_id).stat().st_size // ITEM_SIZE
+        except FileNotFoundError:
+            return 0
+
+    def range(self, user_id: int, start: int = 0, end: Optional[int] = None) -> List[int]:
+        """Timestamps with start <= ts < end (end None = no upper bound), oldest first."""
+        path = self.path(user_id)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            size -= size % ITEM_SIZE
+            if size == 0:
+                return []
+            if sys.byteorder != "little":
+                return [t for t in self._read_all(user_id) if t >= start and (end is None or t < end)]
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm, memoryview(mm) as raw:
+                with raw.cast("I") as view:
+                    lo = bisect.bisect_left(view, int(start))
+                    hi = len(view) if end is None else bisect.bisect_left(view, int(end), lo)
+                    return view[lo:hi].tolist()
@@ -0,0 +1,67 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import tz
+
+# Rolling focus aggregates kept on the user record as "focus_stats":
+#   {"v": 1, "tz": "Europe/Berlin", "total": 123, "hours": [24 counts], "days": {"<date ordinal>": count}}
+# hours is an all-time histogram by the user's local hour; days keeps the
+# last DAY_WINDOW local dates. record() updates all three in O(1) per completion, so the
+# analytics and aurora commands never rescan the focus history.
+VERSION = 1
+DAY_WINDOW = 28
+
+
+def empty(clock: Optional[tz.Clock] = None) -> Dict[str, Any]:
+    return {"v": VERSION, "tz": (clock or tz.clock()).name, "total": 0, "hours": [0] * 24, "days": {}}
+
+
+def today(clock: Optional[tz.Clock] = None, now: Optional[float] = None) -> int:
+    """Local date ordinal for now (or the given timestamp)."""
+    return (clock or tz.clock()).day(time.time() if now is None else now)
+
+
+def record(stats: Dict[str, Any], ts: float, clock: Optional[tz.Clock] = None) -> Dict[str, Any]:
+    """Count one completion at ts in place."""
+    hour, day = (clock or tz.clock()).hour_day(ts)
+    stats["total"] = int(stats.get("total", 0)) + 1
+    stats["hours"][hour] += 1
+    days = stats["days"]
+    days[str(day)] = int(days.get(str(day), 0)) + 1
+    # Drop dates that slid out of the window (at most a few per call)
+    oldest = day - DAY_WINDOW
+    for key in [k for k in days if int(k) <= oldest]:
+        del days[key]
+    return stats
+
+
+def rebuild(timestamps: Iterable[int], clock: Optional[tz.Clock] = None, now: Optional[float] = None) -> Dict[str, Any]:
+    """Aggregates recomputed from a raw focus log."""
+    clock = clock or tz.clock()
+    stats = empty(clock)
+    oldest = today(clock, now) - DAY_WINDOW
+    for hour, day in clock.hours_days(sorted(timestamps)):
+        stats["total"] += 1
+        stats["hours"][hour] += 1
+        if day > oldest:
+            stats["days"][str(day)] = stats["days"].get(str(day), 0) + 1
+    return stats
+
+
+def for_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    """The user's aggregates, rebuilt from a legacy focus_log list if the record predates them."""
+    stats = user.get("focus_stats")
+    if not stats or stats.get("v") != VERSION:
+        stats = rebuild(user.get("focus_log", []), tz.for_user(user))
+    return stats
+
+
+def day_counts(stats: Dict[str, Any], last_day: int, n: int) -> List[int]:
+    """Counts for the n local dates ending at last_day (oldest first)."""
+    days = stats.get("days", {})
+    return [int(days.get(str(d), 0)) for d in range(last_day - n + 1, last_day + 1)]
+
+
+def peak_hour(stats: Dict[str, Any]) -> int:
+    hours = stats.get("hours", [0] * 24)
+    return max(range(24), key=lambda h: hours[h])
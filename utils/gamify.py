@@ -1,84 +1,84 @@
+import math
 from typing import Dict, Tuple, List
 
 import discord
 from discord.ext import commands
 
 from . import database as db
+from . import focusstats
+from . import streaks
+from . import tz
 
 
 # Simple level curve: level n requires total_xp >= 50 * n * (n + 1) / 2
 # This yields L1=50, L2=150, L3=300, L4=500, ...
 
+def level_threshold(level: int) -> int:
+    """Total XP needed to reach `level`."""
+    return 25 * level * (level + 1)
+
+
+def _level_for(xp: int) -> int:
+    # Largest n with 25*n*(n+1) <= xp, i.e. n*(n+1) <= xp // 25
+    m = max(0, int(xp)) // 25
+    return (math.isqrt(4 * m + 1) - 1) // 2
+
+
 def xp_to_level(xp: int) -> Tuple[int, int, int]:
     """Return (level, current_level_base, next_level_xp).
     - level: computed level from xp
     - current_level_base: xp at the start of this level
     - next_level_xp: xp required to reach next level
     """
-    level = 0
-    required_next = 50
-    total_for_next = required_next
-    base = 0
-    while xp >= total_for_next:
-        level += 1
-        base = total_for_next
-        required_next += 50 * (level + 1)
-        total_for_next += 50 * (level + 1)
-    return level, base, total_for_next
-
-
-async def grant_xp_and_check(bot: commands.Bot, user_id: int, delta: int, guild: discord.Guild = None) -> Dict:
-    user = await db.get_user(user_id)
-    old_xp = int(user.get("xp", 0))
-    new_xp = old_xp + int(delta)
-    user["xp"] = new_xp
-    user["monthly_xp"] = int(user.get("monthly_xp", 0)) + int(delta)
+    level = _level_for(xp)
+    return level, level_threshold(level), level_threshold(level + 1)
 
-    # Level up check
-    old_level, _, _ = xp_to_level(old_xp)
-    new_level, _, _ = xp_to_level(new_xp)
-    leveled_up = new_level > old_level
 
-    # Save
-    await db.set_user(user_id, user)
-
-    # Role rewards on level milestones if configured
-    if leveled_up and guild is not None and guild.me and guild.me.guild_permissions.manage_roles:
-        try:
-            level_roles: Dict[str, str] = getattr(bot, "config", {}).get("level_roles", {})
-            role_name = level_roles.get(str(new_level))
-            if role_name:
-                role = discord.utils.get(guild.roles, name=role_name)
-                member = guild.get_member(user_id)
-                if role and member:
-                    await member.add_roles(role, reason=f"Level {new_level} reached")
-        except Exception:
-            pass
+# Rewards for one completed focus phase
+FOCUS_XP = 15
+FOCUS_COINS = 5
 
-    return {"leveled_up": leveled_up, "new_level": new_level, "new_xp": new_xp}
 
+async def _grant_level_role(bot: commands.Bot, guild: discord.Guild, user_id: int, level: int) -> None:
+    # Role rewards on level milestones if configured
+    if guild is None or not guild.me or not guild.me.guild_permissions.manage_roles:
+        return
+    try:
+        level_roles: Dict[str, str] = getattr(bot, "config", {}).get("level_roles", {})
+        role_name = level_roles.get(str(level))
+        if role_name:
+            role = discord.utils.get(guild.roles, name=role_name)
+            member = guild.get_member(user_id)
+            if role and member:
+                await member.add_roles(role, reason=f"Level {level} reached")
+    except Exception:
+        pass
+
+
+def add_xp(user: Dict, delta: int) -> Tuple[int, int]:
+    """Add XP and monthly XP to a user record in place (inside db.user_txn). Returns (old_xp, new_xp)."""
+    old_xp = int(user.get("xp", 0))
+    new_xp = old_xp + int(delta)
+    user["xp"] = new_xp
+    user["monthly_xp"] = int(user.get("monthly_xp", 0)) + int(delta)
+    return old_xp, new_xp
 
-async def record_focus_completion(user_id: int) -> Dict:
-    user = await db.get_user(user_id)
-    user["pomos_completed"] = int(user.get("pomos_completed", 0)) + 1
-    await db.set_user(user_id, user)
-    return user
 
+def _award_achievements(user: Dict, when_ts: float) -> List[str]:
+    """Grant simple achievements in place: Early Bird (<=09:00), Midnight Owl (>=00:00), First 10 Pomos.
 
-async def check_basic_achievements(bot: commands.Bot, user_id: int, when_ts: float) -> List[str]:
-    """Grant simple achievements: Early Bird (<=09:00), Midnight Owl (>=00:00), First 10 Pomos."""
-    import datetime as dt
-    user = await db.get_user(user_id)
+    Hours are in the user's own timezone (see /timezone_set).
+    """
     have: List[str] = list(user.get("achievements", []))
     granted: List[str] = []
 
-    t = dt.datetime.fromtimestamp(when_ts)
+    hour = tz.for_user(user).hour(when_ts)
     # Early Bird: completed focus before 9 AM
-    if t.hour < 9 and "Early Bird" not in have:
+    if hour < 9 and "Early Bird" not in have:
         have.append("Early Bird")
         granted.append("Early Bird")
     # Midnight Owl: completed after 12 AM (0:00-3:59 window to avoid overlap)
-    if t.hour < 4 and "Midnight Owl" not in have:
+    if hour < 4 and "Midnight Owl" not in have:
         have.append("Midnight Owl")
         granted.append("Midnight Owl")
     # First 10 Pomodoros
@@ -86,7 +86,70 @@ async def check_basic_achievements(bot: commands.Bot, user_id: int, when_ts: flo
         have.append("First 10")
         granted.append("First 10")
 
-    if granted:
-        user["achievements"] = have
-        await db.set_user(user_id, user)
+    user["achievements"] = have
     return granted
+
+
+async def apply_focus_completion(bot: commands.Bot, user_id: int, when_ts: float, guild: discord.Guild = None) -> Dict:
+    """Apply every reward for one completed focus phase in a single user transaction.
+
+    Covers pomos, last_focus_ts, focus aggregates, streak, XP, monthly XP, coins and
+    achievements, then the level role if a level was reached. Returns
+    {"leveled_up", "new_level", "new_xp", "coins", "achievements"}.
+    """
+    async with db.user_txn(user_id) as user:
+        if "activity" not in user:
+            # Record from before activity tracking: seed the streak from focus history first
+            user.update(streaks.rebuild(await db.focus_range(user_id), tz.for_user(user), now=when_ts))
+        user["pomos_completed"] = int(user.get("pomos_completed", 0)) + 1
+        user["last_focus_ts"] = int(when_ts)
+        user["focus_stats"] = focusstats.record(focusstats.for_user(user), when_ts, tz.for_user(user))
+        streaks.record(user, when_ts, tz.for_user(user))
+        old_xp, new_xp = add_xp(user, FOCUS_XP)
+        user["coins"] = int(user.get("coins", 0)) + FOCUS_COINS
+        granted = _award_achievements(user, when_ts)
+    await db.append_focus(user_id, int(when_ts))
+    if guild is not None:
+        await db.add_member_xp(guild.id, user_id, FOCUS_XP)
+
+    old_level, _, _ = xp_to_level(old_xp)
+    new_level, _, _ = xp_to_level(new_xp)
+    leveled_up = new_level > old_level
+    if leveled_up:
+        await _grant_level_role(bot, guild, user_id, new_level)
+
+    return {
+        "leveled_up": leveled_up,
+        "new_level": new_level,
+        "new_xp": new_xp,
+        "coins": int(user["coins"]),
+        "achievements": granted,
+    }
+
+
+async def rebuild_focus_stats(user_id: int) -> Dict:
+    """Recompute a user's focus aggregates and streak from their full focus history."""
+    history = await db.focus_range(user_id)
+    async with db.user_txn(user_id) as user:
+        user["focus_stats"] = focusstats.rebuild(history, tz.for_user(user))
+        user.update(streaks.rebuild(history, tz.for_user(user)))
+    return user["focus_stats"]
+
+
+async def on_focus_completed(bot: commands.Bot, event) -> None:
+    """Event bus subscriber: grant the rewards for a FocusCompleted and announce level-ups and achievements."""
+    guild = bot.get_guild(event.guild_id) if event.guild_id else None
+    res = await apply_focus_completion(bot, event.user_id, when_ts=event.when_ts, guild=guild)
+    channel = bot.get_channel(event.channel_id) if event.channel_id else None
+    if not event.live or channel is None:
+        return
+    texts = []
+    if res.get("leveled_up"):
+        texts.append(f"🎉 Level Up! You reached Level {res.get('new_level')}.")
+    if res.get("achievements"):
+        texts.append("Achievements: " + ", ".join(res["achievements"]))
+    if texts:
+        try:
+            await channel.send(" ".join(texts))
+        except Exception:
+            pass
@@ -0,0 +1,73 @@
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+Key = Tuple[int, ...]
+
+
+def rank_key(fields: Sequence[str], user_id: int, user: Dict[str, Any]) -> Key:
+    # The user id breaks ties so every key is unique
+    return tuple(int(user.get(f, 0) or 0) for f in fields) + (int(user_id),)
+
+
+class RankIndex:
+    """Users kept sorted by a tuple of numeric fields, e.g. ("monthly_xp", "xp").
+
+    Keys sit in an ascending list, so the leaders are at the end: top(k)
+    slices k entries and rank() is one bisect. update() moves a single entry
+    (bisect to find it, then a memmove of the list tail), and is a no-op when
+    the fields it sorts on did not change.
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = tuple(fields)
+        self._keys: List[Key] = []
+        self._by_user: Dict[int, Key] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def build(self, users: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+        self._by_user = {int(uid): rank_key(self.fields, uid, u) for uid, u in users}
+        self._keys = sorted(self._by_user.values())
+
+    def update(self, user_id: int, user: Dict[str, Any]) -> None:
+        uid = int(user_id)
+        key = rank_key(self.fields, uid, user)
+        old = self._by_user.get(uid)
+        if old == key:
+            return
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, old)]
+        bisect.insort(self._keys, key)
+        self._by_user[uid] = key
+
+    def remove(self, user_id: int) -> None:
+        old = self._by_user.pop(int(user_id), None)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, old)]
+
+    def top(self, limit: int) -> List[Key]:
+        """Highest `limit` keys, best first. Each key ends with the user id."""
+        if limit <= 0:
+            return []
+        return self._keys[:-limit - 1:-1]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based position of the user, or None if they are not indexed."""
+        key = self._by_user.get(int(user_id))
+        if key is None:
+            return None
+        return len(self._keys) - bisect.bisect_left(self._keys, key)
+
+    def zero_leading(self, order: "RankIndex") -> None:
+        """Set the leading field to 0 for everyone, e.g. the monthly rollover.
+
+        With the leading field zeroed the remaining order is exactly `order`'s
+        (which must be keyed by this index's other fields), so the index is
+        rebuilt in one pass without sorting.
+        """
+        if order.fields != self.fields[1:]:
+            raise ValueError("order index must be keyed by the trailing fields")
+        self._keys = [(0,) + key for key in order._keys]
+        self._by_user = {key[-1]: key for key in self._keys}
@@ -0,0 +1,109 @@
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+# Minimal bar chart renderer with no third-party dependencies, used when
+# matplotlib is missing or configured off. Text uses a 3x5 pixel font
+# (upper-case letters, digits and a little punctuation), scaled up.
+
+_FONT: Dict[str, Tuple[str, ...]] = {
+    "0": ("111", "101", "101", "101", "111"), "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"), "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"), "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"), "7": ("111", "001", "010", "010", "010"),
+    "8": ("111", "101", "111", "101", "111"), "9": ("111", "101", "111", "001", "111"),
+    "A": ("010", "101", "111", "101", "101"), "B": ("110", "101", "110", "101", "110"),
+    "C": ("011", "100", "100", "100", "011"), "D": ("110", "101", "101", "101", "110"),
+    "E": ("111", "100", "110", "100", "111"), "F": ("111", "100", "110", "100", "100"),
+    "G": ("011", "100", "101", "101", "011"), "H": ("101", "101", "111", "101", "101"),
+    "I": ("111", "010", "010", "010", "111"), "J": ("001", "001", "001", "101", "010"),
+    "K": ("101", "110", "100", "110", "101"), "L": ("100", "100", "100", "100", "111"),
+    "M": ("101", "111", "111", "101", "101"), "N": ("110", "101", "101", "101", "101"),
+    "O": ("010", "101", "101", "101", "010"), "P": ("110", "101", "110", "100", "100"),
+    "Q": ("010", "101", "101", "110", "011"), "R": ("110", "101", "110", "101", "101"),
+    "S": ("011", "100", "010", "001", "110"), "T": ("111", "010", "010", "010", "010"),
+    "U": ("101", "101", "101", "101", "111"), "V": ("101", "101", "101", "101", "010"),
+    "W": ("101", "101", "111", "111", "101"), "X": ("101", "101", "010", "101", "101"),
+    "Y": ("101", "101", "010", "010", "010"), "Z": ("111", "001", "010", "100", "111"),
+    "(": ("010", "100", "100", "100", "010"), ")": ("010", "001", "001", "001", "010"),
+    "-": ("000", "000", "111", "000", "000"), ":": ("000", "010", "000", "010", "000"),
+    ".": ("000", "000", "000", "000", "010"), " ": ("000", "000", "000", "000", "000"),
+}
+
+WIDTH = 700
+HEIGHT = 300
+MARGIN = 30
+BACKGROUND = (255, 255, 255)
+TEXT = (40, 40, 40)
+AXIS = (160, 160, 160)
+
+
+def _hex_rgb(color: str) -> Tuple[int, int, int]:
+    color = color.lstrip("#")
+    return int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16)
+
+
+def _png(width: int, height: int, rows: List[bytearray]) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    # Filter type 0 (none) per scanline
+    raw = b"".join(b"\x00" + bytes(row) for row in rows)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+class _Canvas:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.rows = [bytearray(BACKGROUND * width) for _ in range(height)]
+
+    def rect(self, x0: int, y0: int, x1: int, y1: int, rgb: Tuple[int, int, int]) -> None:
+        x0, x1 = max(0, x0), min(self.width, x1)
+        y0, y1 = max(0, y0), min(self.height, y1)
+        if x0 >= x1:
+            return
+        span = bytes(rgb) * (x1 - x0)
+        for y in range(y0, y1):
+            self.rows[y][x0 * 3:x1 * 3] = span
+
+    def text(self, x: int, y: int, s: str, scale: int, rgb: Tuple[int, int, int]) -> None:
+        for ch in s.upper():
+            glyph = _FONT.get(ch, _FONT[" "])
+            for gy, line in enumerate(glyph):
+                for gx, bit in enumerate(line):
+                    if bit == "1":
+                        self.rect(x + gx * scale, y + gy * scale, x + (gx + 1) * scale, y + (gy + 1) * scale, rgb)
+            x += 4 * scale
+
+    @staticmethod
+    def text_width(s: str, scale: int) -> int:
+        return max(0, len(s) * 4 * scale - scale)
+
+
+def render_bar_png(labels: List[str], values: List[int], title: str, color: str = "#7C3AED") -> bytes:
+    """Bar chart PNG with a title, x labels and the peak value marked on the y axis."""
+    canvas = _Canvas(WIDTH, HEIGHT)
+    bar_rgb = _hex_rgb(color)
+    canvas.text((WIDTH - canvas.text_width(title, 3)) // 2, 8, title, 3, TEXT)
+
+    top, bottom = MARGIN + 10, HEIGHT - MARGIN
+    left, right = MARGIN + 20, WIDTH - MARGIN
+    canvas.rect(left, top, left + 1, bottom, AXIS)
+    canvas.rect(left, bottom, right, bottom + 1, AXIS)
+    peak = max([int(v) for v in values] + [1])
+    canvas.text(left - canvas.text_width(str(peak), 2) - 4, top, str(peak), 2, TEXT)
+    canvas.text(left - canvas.text_width("0", 2) - 4, bottom - 10, "0", 2, TEXT)
+
+    n = max(1, len(values))
+    slot = (right - left - 4) / n
+    gap = max(1, int(slot * 0.2))
+    for i, (label, value) in enumerate(zip(labels, values)):
+        x0 = left + 4 + int(i * slot) + gap // 2
+        x1 = left + 4 + int((i + 1) * slot) - gap // 2
+        height = int((bottom - top) * max(0, int(value)) / peak)
+        canvas.rect(x0, bottom - height, x1, bottom, bar_rgb)
+        scale = 2 if canvas.text_width(label, 2) <= x1 - x0 + gap else 1
+        canvas.text((x0 + x1 - canvas.text_width(label, scale)) // 2, bottom + 6, label, scale, TEXT)
+    return _png(WIDTH, HEIGHT, canvas.rows)
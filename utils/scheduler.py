@@ -0,0 +1,112 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger("aurorafocus")
+
+
+class DeadlineScheduler:
+    """One task that sleeps until the earliest deadline and hands every due key to `handler`.
+
+    Deadlines live in a min-heap, so schedule() is O(log n). Rescheduling or
+    cancelling a key leaves its old heap entry behind; stale entries are
+    skipped when they surface. The handler runs on the scheduler task and
+    should hand slow work off to its own tasks so other deadlines stay on time.
+    """
+
+    def __init__(self, handler: Callable[[List[Hashable]], Awaitable[None]]):
+        self._handler = handler
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._due: Dict[Hashable, float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Counters
+        self.wakeups = 0
+        self.fired = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._due
+
+    def schedule(self, key: Hashable, due: float) -> None:
+        """Set (or move) the deadline for key."""
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._seq), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> None:
+        self._due.pop(key, None)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "scheduled": len(self._due),
+            "heap_size": len(self._heap),
+            "wakeups": self.wakeups,
+            "fired": self.fired,
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+    def _next_due(self) -> Optional[float]:
+        while self._heap:
+            due, _, key = self._heap[0]
+            if self._due.get(key) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def _pop_due(self, now: float) -> List[Hashable]:
+        keys: List[Hashable] = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, key = heapq.heappop(self._heap)
+            if self._due.get(key) != due:
+                continue
+            del self._due[key]
+            keys.append(key)
+            lag = now - due
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+        return keys
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            due = self._next_due()
+            if due is None:
+                await self._wakeup.wait()
+                continue
+            delay = due - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    # An earlier deadline arrived; recompute
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            keys = self._pop_due(time.time())
+            if not keys:
+                continue
+            self.wakeups += 1
+            self.fired += len(keys)
+            try:
+                await self._handler(keys)
+            except Exception:
+                logger.exception("Scheduler handler failed")
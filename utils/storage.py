@@ -0,0 +1,251 @@
+import copy
+import heapq
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from .fileio import atomic_write_json, read_json_with_fallback
+
+
+# Every collection is kept resident in memory: reads are served from the
+# cached dict, and mutations only mark their key dirty. take_dirty() turns the
+# dirty keys into records which write() persists; utils.database runs write()
+# and compact() on its I/O thread so blocking calls stay off the event loop.
+# Records:
+#   {"op": "set", "k": key, "v": value}
+#   {"op": "del", "k": key}
+#   {"op": "put", "v": whole_document}
+# All ops are idempotent, so replaying records that are already persisted is safe.
+
+class Store:
+    def __init__(self, default: Dict[str, Any]):
+        self.default = default
+        self.data: Optional[Dict[str, Any]] = None
+        self._dirty: Set[str] = set()
+        self._dirty_doc = False
+
+    @property
+    def loaded(self) -> bool:
+        return self.data is not None
+
+    @property
+    def dirty_count(self) -> int:
+        return 1 if self._dirty_doc else len(self._dirty)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return False
+
+    def load(self) -> Dict[str, Any]:
+        if self.data is None:
+            self.data = self._load()
+        return self.data
+
+    def _load(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    # Values handed in and out are copied so callers can never mutate the
+    # resident state behind the store's back. Stored values are only ever
+    # replaced, never mutated in place, so a shallow copy of data is a
+    # consistent snapshot for the I/O thread.
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.load().get(key, default)
+        return copy.deepcopy(value)
+
+    def document(self) -> Dict[str, Any]:
+        return copy.deepcopy(self.load())
+
+    def set(self, key: str, value: Any) -> None:
+        self.load()[key] = copy.deepcopy(value)
+        self._dirty.add(key)
+
+    def delete(self, key: str) -> None:
+        if key not in self.load():
+            return
+        del self.data[key]
+        self._dirty.add(key)
+
+    def replace(self, doc: Dict[str, Any]) -> None:
+        self.load()
+        self.data = copy.deepcopy(doc)
+        self._dirty_doc = True
+        self._dirty.clear()
+
+    def take_dirty(self) -> List[Dict[str, Any]]:
+        """Return records for every dirty key and clear the dirty set."""
+        if self.data is None or not self.dirty_count:
+            return []
+        if self._dirty_doc:
+            recs = [{"op": "put", "v": dict(self.data)}]
+        else:
+            recs = []
+            for key in self._dirty:
+                if key in self.data:
+                    recs.append({"op": "set", "k": key, "v": self.data[key]})
+                else:
+                    recs.append({"op": "del", "k": key})
+        self._dirty.clear()
+        self._dirty_doc = False
+        return recs
+
+    def write(self, recs: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def compact(self, snapshot: Dict[str, Any]) -> None:
+        pass
+
+    def top(self, order: Sequence[str], limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """Top `limit` records ordered by the given numeric fields, descending."""
+        items = self.load().items()
+        best = heapq.nlargest(limit, items, key=lambda kv: tuple(int(kv[1].get(f, 0) or 0) for f in order))
+        return [(k, copy.deepcopy(v)) for k, v in best]
+
+
+# JSON snapshot (users.json) plus an append-only log next to it (users.log).
+# write() appends one line per record; compact() atomically replaces the
+# snapshot (keeping `backups` older copies) and only then truncates the log.
+class LogStore(Store):
+    def __init__(self, path: Path, default: Dict[str, Any], compact_every: int = 500,
+                 fsync: bool = True, backups: int = 3):
+        super().__init__(default)
+        self.path = path
+        self.log_path = path.with_suffix(".log")
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.backups = backups
+        self.log_records = 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.log_records >= self.compact_every
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the snapshot (or the newest good backup) and replay the log written after it."""
+        data, _ = read_json_with_fallback(self.path, self.backups)
+        if data is None:
+            data = copy.deepcopy(self.default)
+        self.log_records = 0
+        if self.log_path.exists():
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final record from a crash mid-append
+                        break
+                    data = _apply(data, rec)
+                    self.log_records += 1
+        return data
+
+    def write(self, recs: List[Dict[str, Any]]) -> None:
+        if not recs:
+            return
+        lines = [json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n" for rec in recs]
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.log_records += len(recs)
+
+    def compact(self, snapshot: Dict[str, Any]) -> None:
+        """Write a fresh snapshot, then truncate the log."""
+        if self.log_records == 0:
+            return
+        atomic_write_json(self.path, snapshot, fsync=self.fsync, backups=self.backups)
+        with open(self.log_path, "w", encoding="utf-8"):
+            pass
+        self.log_records = 0
+
+
+def _apply(data: Dict[str, Any], rec: Dict[str, Any]) -> Dict[str, Any]:
+    op = rec.get("op")
+    if op == "set":
+        data[rec["k"]] = rec["v"]
+    elif op == "del":
+        data.pop(rec["k"], None)
+    elif op == "put":
+        data = rec["v"]
+    return data
+
+
+# SQLite backend: one table per collection, one row per top-level key with the
+# value stored as JSON. Fields that the cogs sort or filter on are exposed as
+# generated columns so they can be indexed.
+INDEXED_COLUMNS: Dict[str, Dict[str, str]] = {
+    "users": {"xp": "INTEGER", "monthly_xp": "INTEGER"},
+}
+INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "users": [("xp",), ("monthly_xp", "xp")],
+}
+# Indexes older databases may still carry that nothing queries any more
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    "users": ["idx_users_last_focus_ts"],
+}
+
+
+def open_sqlite(path: Path, fsync: bool = True) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+    return conn
+
+
+class SqliteStore(Store):
+    def __init__(self, conn: sqlite3.Connection, table: str, default: Dict[str, Any]):
+        super().__init__(default)
+        self.conn = conn
+        self.table = table
+        self._ensure_table()
+
+    def _ensure_table(self) -> None:
+        cols = ["k TEXT PRIMARY KEY", "v TEXT NOT NULL"]
+        for name, typ in INDEXED_COLUMNS.get(self.table, {}).items():
+            cols.append(f"{name} {typ} GENERATED ALWAYS AS (CAST(IFNULL(json_extract(v, '$.{name}'), 0) AS {typ})) VIRTUAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(cols)})")
+        for fields in INDEXES.get(self.table, []):
+            name = f"idx_{self.table}_{'_'.join(fields)}"
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {self.table} ({', '.join(fields)})")
+        for name in RETIRED_INDEXES.get(self.table, []):
+            self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def is_empty(self) -> bool:
+        return self.conn.execute(f"SELECT 1 FROM {self.table} LIMIT 1").fetchone() is None
+
+    def _load(self) -> Dict[str, Any]:
+        rows = self.conn.execute(f"SELECT k, v FROM {self.table}").fetchall()
+        if not rows:
+            return copy.deepcopy(self.default)
+        return {k: json.loads(v) for k, v in rows}
+
+    def write(self, recs: List[Dict[str, Any]]) -> None:
+        if not recs:
+            return
+        upsert = f"INSERT INTO {self.table} (k, v) VALUES (?, ?) ON CONFLICT(k) DO UPDATE SET v = excluded.v"
+        with self.conn:
+            self.conn.execute("BEGIN")
+            for rec in recs:
+                op = rec.get("op")
+                if op == "set":
+                    self.conn.execute(upsert, (rec["k"], json.dumps(rec["v"], ensure_ascii=False)))
+                elif op == "del":
+                    self.conn.execute(f"DELETE FROM {self.table} WHERE k = ?", (rec["k"],))
+                elif op == "put":
+                    self.conn.execute(f"DELETE FROM {self.table}")
+                    self.conn.executemany(upsert, [(k, json.dumps(v, ensure_ascii=False)) for k, v in rec["v"].items()])
+
+    def compact(self, snapshot: Dict[str, Any]) -> None:
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # Indexed queries; callers flush dirty records first and run these on the I/O thread.
+    def top(self, order: Sequence[str], limit: int) -> List[Tuple[str, Dict[str, Any]]]:
+        if any(f not in INDEXED_COLUMNS.get(self.table, {}) for f in order):
+            return super().top(order, limit)
+        order_by = ", ".join(f"{f} DESC" for f in order)
+        rows = self.conn.execute(f"SELECT k, v FROM {self.table} ORDER BY {order_by} LIMIT ?", (int(limit),)).fetchall()
+        return [(k, json.loads(v)) for k, v in rows]
@@ -0,0 +1,122 @@
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from . import tz
+
+# Focus streaks, kept on the user record:
+#   "streak": current run of consecutive active local days
+#   "longest_streak": best run ever
+#   "last_active_day": local date ordinal of the latest completion
+#   "activity": {"v": 1, "start": <date ordinal of bit 0>, "bits": "<hex>"}
+# Bit i of the activity bitmap is set when the user finished at least one
+# focus phase on local day start + i. record() updates the counters in O(1)
+# per completion; the bitmap is only scanned when a completion arrives for an
+# earlier day and may join two runs. The window slides forward so the bitmap
+# never holds more than WINDOW_DAYS bits.
+VERSION = 1
+WINDOW_DAYS = 400
+
+
+def empty_activity(start: int = 0) -> Dict[str, Any]:
+    return {"v": VERSION, "start": int(start), "bits": "0"}
+
+
+def _bits(activity: Dict[str, Any]) -> int:
+    return int(activity.get("bits", "0") or "0", 16)
+
+
+def is_active(user: Dict[str, Any], day: int) -> bool:
+    activity = user.get("activity") or empty_activity()
+    offset = day - int(activity.get("start", 0))
+    return offset >= 0 and bool(_bits(activity) >> offset & 1)
+
+
+def _set_day(activity: Dict[str, Any], day: int) -> Dict[str, Any]:
+    start, bits = int(activity.get("start", day)), _bits(activity)
+    if bits == 0:
+        start = day
+    elif day < start:
+        if start - day >= WINDOW_DAYS:
+            return activity
+        bits <<= start - day
+        start = day
+    bits |= 1 << (day - start)
+    # Slide the window so the newest bit stays within WINDOW_DAYS
+    excess = bits.bit_length() - WINDOW_DAYS
+    if excess > 0:
+        bits >>= excess
+        start += excess
+    return {"v": VERSION, "start": start, "bits": format(bits, "x")}
+
+
+def _run_ending(activity: Dict[str, Any], day: int) -> int:
+    """Length of the run of active days ending at day (0 if day is inactive)."""
+    offset = day - int(activity.get("start", 0))
+    if offset < 0:
+        return 0
+    bits = _bits(activity)
+    # Trailing ones of the bits up to and including day
+    window = ~bits & ((1 << (offset + 1)) - 1)
+    return offset + 1 - window.bit_length()
+
+
+def _run_after(activity: Dict[str, Any], day: int) -> int:
+    """Number of consecutive active days straight after day."""
+    above = _bits(activity) >> (day - int(activity.get("start", 0)) + 1)
+    return (above ^ (above + 1)).bit_length() - 1
+
+
+def record(user: Dict[str, Any], ts: float, clock: Optional[tz.Clock] = None) -> Dict[str, Any]:
+    """Mark the local day of ts active and update streak counters in place."""
+    day = (clock or tz.clock()).day(ts)
+    activity = _set_day(user.get("activity") or empty_activity(day), day)
+    user["activity"] = activity
+    last = int(user.get("last_active_day", 0) or 0)
+    streak = int(user.get("streak", 0) or 0)
+    if day == last:
+        streak = max(streak, 1)
+    elif day == last + 1:
+        streak += 1
+        last = day
+    elif day > last:
+        streak = 1
+        last = day
+    else:
+        # Late completion for an earlier day: it may have joined two runs
+        streak = _run_ending(activity, last)
+        longest = _run_ending(activity, day) + _run_after(activity, day)
+        user["longest_streak"] = max(int(user.get("longest_streak", 0) or 0), longest)
+    user["streak"] = streak
+    user["last_active_day"] = last
+    user["longest_streak"] = max(int(user.get("longest_streak", 0) or 0), streak)
+    return user
+
+
+def rebuild(timestamps: Iterable[int], clock: Optional[tz.Clock] = None, now: Optional[float] = None) -> Dict[str, Any]:
+    """Streak fields recomputed from a raw focus log (e.g. after a timezone change)."""
+    clock = clock or tz.clock()
+    fields: Dict[str, Any] = {"streak": 0, "longest_streak": 0, "last_active_day": 0, "activity": empty_activity()}
+    days = sorted({day for _, day in clock.hours_days(sorted(timestamps))})
+    run, prev = 0, None
+    for day in days:
+        run = run + 1 if prev is not None and day == prev + 1 else 1
+        fields["longest_streak"] = max(fields["longest_streak"], run)
+        fields["activity"] = _set_day(fields["activity"], day)
+        prev = day
+    if prev is not None:
+        fields["last_active_day"] = prev
+        fields["streak"] = run
+    if is_broken(fields, clock.day(time.time() if now is None else now)):
+        fields["streak"] = 0
+    return fields
+
+
+def is_broken(user: Dict[str, Any], today: int) -> bool:
+    """True when the stored streak is positive but a whole local day has passed without activity."""
+    return int(user.get("streak", 0) or 0) > 0 and today - int(user.get("last_active_day", 0) or 0) > 1
+
+
+def current(user: Dict[str, Any], now: Optional[float] = None) -> int:
+    """The user's live streak, counting a broken one as 0 before the nightly job stores it."""
+    today = tz.for_user(user).day(time.time() if now is None else now)
+    return 0 if is_broken(user, today) else int(user.get("streak", 0) or 0)
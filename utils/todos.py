@@ -0,0 +1,88 @@
+import bisect
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# To-dos live in their own collection (data/todos.json), one document per user:
+#   {"next_id": 4, "items": {"1": {"title", "cat", "status", "priority", "created", "due"}, ...}}
+# Ids are small per-user integers that never change or get reused, so
+# "/todo_complete 3" keeps meaning the same item as others are added.
+
+DONE = "Done"
+
+
+def legacy_items(raw: Any) -> List[Dict[str, Any]]:
+    """Items from the old user["todos"] list (dicts, or plain strings in the oldest format)."""
+    if not raw or not isinstance(raw, list):
+        return []
+    if isinstance(raw[0], dict):
+        return [dict(t) for t in raw]
+    now = int(time.time())
+    return [{
+        "title": str(s),
+        "cat": "Personal",
+        "status": "Pending",
+        "priority": "normal",
+        "created": now,
+        "due": None,
+    } for s in raw]
+
+
+class TodoIndex:
+    """Secondary indexes over one user's to-dos: ids by status and by category,
+    plus (due, id) of open items with a due time, kept sorted for overdue counts."""
+
+    def __init__(self, items: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.ids: Set[int] = set()
+        self.by_status: Dict[str, Set[int]] = {}
+        self.by_cat: Dict[str, Set[int]] = {}
+        self.open_due: List[Tuple[int, int]] = []
+        for key, todo in (items or {}).items():
+            self.add(int(key), todo)
+
+    @staticmethod
+    def _due_entry(todo_id: int, todo: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        if todo.get("due") and todo.get("status") != DONE:
+            return int(todo["due"]), todo_id
+        return None
+
+    def add(self, todo_id: int, todo: Dict[str, Any]) -> None:
+        self.ids.add(todo_id)
+        self.by_status.setdefault(todo.get("status", "Pending"), set()).add(todo_id)
+        self.by_cat.setdefault(todo.get("cat", "Personal"), set()).add(todo_id)
+        entry = self._due_entry(todo_id, todo)
+        if entry is not None:
+            bisect.insort(self.open_due, entry)
+
+    def remove(self, todo_id: int, todo: Dict[str, Any]) -> None:
+        self.ids.discard(todo_id)
+        self.by_status.get(todo.get("status", "Pending"), set()).discard(todo_id)
+        self.by_cat.get(todo.get("cat", "Personal"), set()).discard(todo_id)
+        entry = self._due_entry(todo_id, todo)
+        if entry is not None:
+            i = bisect.bisect_left(self.open_due, entry)
+            if i < len(self.open_due) and self.open_due[i] == entry:
+                del self.open_due[i]
+
+    def update(self, todo_id: int, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+        self.remove(todo_id, old)
+        self.add(todo_id, new)
+
+    def select(self, status: Optional[str] = None, category: Optional[str] = None) -> List[int]:
+        """Ids matching the filters, oldest first."""
+        sets = [self.ids]
+        if status is not None:
+            sets.append(self.by_status.get(status, set()))
+        if category is not None:
+            sets.append(self.by_cat.get(category, set()))
+        smallest = min(sets, key=len)
+        return sorted(i for i in smallest if all(i in s for s in sets if s is not smallest))
+
+    def overdue(self, now: float) -> int:
+        """Open items whose due time is before now."""
+        return bisect.bisect_left(self.open_due, (int(now), -1))
+
+    def counts(self, statuses: Iterable[str], categories: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        return {
+            "status": {s: len(self.by_status.get(s, ())) for s in statuses},
+            "category": {c: len(self.by_cat.get(c, ())) for c in categories},
+        }
@@ -0,0 +1,141 @@
+import bisect
+import datetime as dt
+import functools
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+except ImportError:  # Python < 3.9
+    ZoneInfo = None  # type: ignore[assignment]
+
+# Per-user local time without building a datetime per timestamp. Each zone's
+# UTC offset transitions between SPAN_START and SPAN_END are found once (daily
+# samples, then a bisection to the exact second) and cached; after that a
+# timestamp's local hour and date are one bisect plus integer arithmetic.
+SPAN_START = int(dt.datetime(2015, 1, 1, tzinfo=dt.timezone.utc).timestamp())
+SPAN_END = int(dt.datetime(2040, 1, 1, tzinfo=dt.timezone.utc).timestamp())
+# date(1970, 1, 1).toordinal()
+EPOCH_ORDINAL = 719163
+
+
+def _local_offset(ts: int) -> int:
+    return time.localtime(ts).tm_gmtoff
+
+
+class Clock:
+    """Local-time arithmetic for one zone (an IANA name, or the host's zone for "")."""
+
+    def __init__(self, name: str, offset_fn: Callable[[int], int]):
+        self.name = name
+        self._offset_fn = offset_fn
+        self._starts, self._offsets = self._transitions()
+
+    def _transitions(self) -> Tuple[List[int], List[int]]:
+        starts = [SPAN_START]
+        offsets = [self._offset_fn(SPAN_START)]
+        prev_t, prev_off = SPAN_START, offsets[0]
+        for t in range(SPAN_START + 86400, SPAN_END + 1, 86400):
+            off = self._offset_fn(t)
+            if off != prev_off:
+                # The change happened in (prev_t, t]; find the first second with the new offset
+                lo, hi = prev_t, t
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    if self._offset_fn(mid) == prev_off:
+                        lo = mid
+                    else:
+                        hi = mid
+                starts.append(hi)
+                offsets.append(off)
+            prev_t, prev_off = t, off
+        return starts, offsets
+
+    def offset(self, ts: float) -> int:
+        """UTC offset in seconds at ts."""
+        ts = int(ts)
+        if SPAN_START <= ts < SPAN_END:
+            return self._offsets[bisect.bisect_right(self._starts, ts) - 1]
+        return self._offset_fn(ts)
+
+    def hour(self, ts: float) -> int:
+        return (int(ts) + self.offset(ts)) // 3600 % 24
+
+    def day(self, ts: float) -> int:
+        """Local date as a proleptic Gregorian ordinal (date.toordinal())."""
+        return (int(ts) + self.offset(ts)) // 86400 + EPOCH_ORDINAL
+
+    def hour_day(self, ts: float) -> Tuple[int, int]:
+        local = int(ts) + self.offset(ts)
+        return local // 3600 % 24, local // 86400 + EPOCH_ORDINAL
+
+    def hours_days(self, timestamps: Iterable[int]) -> List[Tuple[int, int]]:
+        """(hour, date ordinal) for many timestamps.
+
+        Sorted input is cut into runs that share one offset, and each run is
+        converted with plain arithmetic; unsorted input falls back to hour_day().
+        """
+        ts = [int(t) for t in timestamps]
+        if any(ts[i] > ts[i + 1] for i in range(len(ts) - 1)):
+            return [self.hour_day(t) for t in ts]
+        lo = bisect.bisect_left(ts, SPAN_START)
+        hi = bisect.bisect_left(ts, SPAN_END)
+        out = [self.hour_day(t) for t in ts[:lo]]
+        starts, offsets = self._starts, self._offsets
+        i = lo
+        for seg, off in enumerate(offsets):
+            if i >= hi:
+                break
+            seg_end = starts[seg + 1] if seg + 1 < len(starts) else SPAN_END
+            j = bisect.bisect_left(ts, seg_end, i, hi)
+            out.extend(((t + off) // 3600 % 24, (t + off) // 86400 + EPOCH_ORDINAL) for t in ts[i:j])
+            i = j
+        out.extend(self.hour_day(t) for t in ts[hi:])
+        return out
+
+
+@functools.lru_cache(maxsize=256)
+def clock(name: str = "") -> Clock:
+    """Cached Clock for an IANA zone name; "" (or an unknown name) means the host's local time."""
+    if name and ZoneInfo is not None:
+        try:
+            zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            zone = None
+        if zone is not None:
+            return Clock(name, lambda ts: int(dt.datetime.fromtimestamp(ts, zone).utcoffset().total_seconds()))
+    return Clock("", _local_offset)
+
+
+def for_user(user: Dict[str, Any]) -> Clock:
+    return clock(str(user.get("tz", "") or ""))
+
+
+def is_valid(name: str) -> bool:
+    if ZoneInfo is None:
+        return False
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def zone_names() -> List[str]:
+    if ZoneInfo is None:
+        return []
+    return sorted(available_timezones())
+
+
+def search(query: str, limit: int = 25) -> List[str]:
+    """Zone names containing query (case-insensitive), for slash-command autocomplete."""
+    q = query.lower().replace(" ", "_")
+    return [z for z in zone_names() if q in z.lower()][:limit]
+
+
+def describe(c: Clock, now: Optional[float] = None) -> str:
+    off = c.offset(time.time() if now is None else now)
+    sign = "+" if off >= 0 else "-"
+    hours, rem = divmod(abs(off), 3600)
+    return f"{c.name or 'server time'} (UTC{sign}{hours:02d}:{rem // 60:02d})"